@@ -0,0 +1,136 @@
+"""
+===================================================================================
+Name: analyze.py
+Author: Madi Sanchez-Forman
+Version: 5.10.23
+Decription: This script scores the best moves of many positions, for labelling
+datasets and regression checks. Positions are read from a file, one per line as the
+64 character string from Board.get_position followed by the id to move (blank lines
+and lines starting with # are skipped). They are analyzed in a process pool with
+Computer_Player.analyze, and each result is written to a JSON lines file as soon as
+it finishes, so results come out of order; each one carries its line number. Moves
+are [x, y] from 0 like the other JSON outputs, and scores are from the point of
+view of the player to move.
+Example:
+    python analyze.py positions.txt --depth 6 --top 3 --workers 8 --output analysis.jsonl
+===================================================================================
+"""
+from board import Board, OTHER_ID
+from computer_player import Computer_Player
+from transposition_table import DEFAULT_MEGABYTES
+from concurrent.futures import ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
+import argparse
+import json
+import os
+import sys
+
+#******************* Constants *******************#
+PENDING_PER_WORKER = 4 #positions queued per worker, so a large file is never read into memory all at once
+
+#******************* Analysis Worker *******************#
+_players = {} #one player per id in each worker process, reused for every position it analyzes
+
+def analyze_position(line_number, position, cur_id, depth, top, settings):
+    """
+    Analyzes one position in a worker process
+    Params: line number in the positions file, position string from Board.get_position, id to move, depth, number of moves to score,
+    dictionary of Computer_Player keyword arguments
+    Returns: dictionary describing the result
+    """
+    if cur_id not in _players:
+        _players[cur_id] = Computer_Player(cur_id, depth, verbose=False, **settings)
+    player = _players[cur_id]
+    board = Board(OTHER_ID[cur_id], cur_id)
+    board.set_position(position)
+    moves = player.analyze(board, depth, top)
+    return {
+        'line': line_number,
+        'position': position,
+        'to_move': cur_id,
+        'depth': depth,
+        'moves': [{'move': list(move), 'score': score} for move, score in moves],
+        'nodes': player.stats.nodes,
+        'seconds': player.stats.seconds,
+    }
+
+#******************* Helpers *******************#
+def read_positions(path):
+    """
+    Reads positions from a file
+    Params: path of the file
+    Returns: generator of (line number, position string, id to move)
+    Raises ValueError on a line that is not a position
+    """
+    with open(path) as positions_file:
+        for line_number, line in enumerate(positions_file, 1):
+            fields = line.split()
+            if not fields or fields[0].startswith('#'):
+                continue
+            if len(fields) != 2 or fields[1].upper() not in OTHER_ID:
+                raise ValueError(path + ":" + str(line_number) + ": expected '<position> <B|W>'")
+            Board('B', 'W').set_position(fields[0]) #checks the encoding before the position is sent to a worker
+            yield line_number, fields[0], fields[1].upper()
+
+def write_results(futures, output):
+    """
+    Writes the results of analyses as lines of JSON, flushing after each so results can be read while the analysis is still running
+    Params: iterable of finished (or finishing) futures from analyze_position, open file to write results to
+    Returns: number of results written
+    """
+    written = 0
+    for future in futures:
+        output.write(json.dumps(future.result()) + '\n')
+        output.flush()
+        written += 1
+    return written
+
+def run_analysis(positions_path, output, depth, top=None, workers=None, settings=None):
+    """
+    Analyzes every position in a file in a process pool, writing each result as a line of JSON when it finishes
+    Params: path of the positions file, open file to write results to, depth, number of moves to score per position (None for all),
+    number of processes (None for one per core), dictionary of extra Computer_Player keyword arguments
+    Returns: number of positions analyzed
+    Raises ValueError on a line that is not a position, after writing the results of every position before it
+    """
+    settings = {} if settings is None else settings
+    analyzed = 0
+    max_pending = PENDING_PER_WORKER * (workers or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        try:
+            for line_number, position, cur_id in read_positions(positions_path):
+                pending.add(pool.submit(analyze_position, line_number, position, cur_id, depth, top, settings))
+                if len(pending) >= max_pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    analyzed += write_results(done, output)
+        except ValueError:
+            write_results(as_completed(pending), output) #positions already sent to the workers still get their results
+            raise
+        analyzed += write_results(as_completed(pending), output)
+    return analyzed
+
+#******************* Main Driver Function *******************#
+def main():
+    parser = argparse.ArgumentParser(description='Score the best moves of many Reversi positions.')
+    parser.add_argument('positions', help="file with one '<position> <B|W>' per line")
+    parser.add_argument('--depth', type=int, default=4, help='number of plies to search')
+    parser.add_argument('--top', type=int, default=None, help='number of moves to score exactly per position (default: every legal move)')
+    parser.add_argument('--workers', type=int, default=None, help='number of processes (default: one per core)')
+    parser.add_argument('--tt-megabytes', type=int, default=DEFAULT_MEGABYTES, help='transposition table size of each worker')
+    parser.add_argument('--patterns', default=None, help='pattern weights file fitted by train_patterns.py')
+    parser.add_argument('--output', default=None, help='file to write one JSON result per line to (default: print them)')
+    args = parser.parse_args()
+    if args.depth < 1 or (args.top is not None and args.top < 1):
+        parser.error('--depth and --top must be at least 1')
+    settings = {'tt_megabytes': args.tt_megabytes, 'pattern_path': args.patterns}
+    try:
+        if args.output is None:
+            run_analysis(args.positions, sys.stdout, args.depth, args.top, args.workers, settings)
+        else:
+            with open(args.output, 'w') as output:
+                run_analysis(args.positions, output, args.depth, args.top, args.workers, settings)
+    except ValueError as error: #a bad line stops the run once every position before it is written
+        raise SystemExit("analyze.py: stopped at a bad line: " + str(error))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+===================================================================================
+Name: batch_eval.py
+Author: Madi Sanchez-Forman
+Version: 5.10.23
+Decription: This script scores many positions at once with NumPy. Positions are
+given as two stacked arrays of bitboards (black and white), and coin parity, mobility
+and static weight score are computed for all of them with array operations. The
+scores are the same as Computer_Player.heuristic_score gives one position at a time.
+===================================================================================
+"""
+import numpy as np
+
+#******************* Constants *******************#
+FULL_BOARD = np.uint64(0xFFFFFFFFFFFFFFFF)
+NOT_EDGE_COLUMNS = np.uint64(0x7E7E7E7E7E7E7E7E)
+SHIFTS = [(np.uint64(1), NOT_EDGE_COLUMNS), (np.uint64(7), NOT_EDGE_COLUMNS), (np.uint64(8), FULL_BOARD), (np.uint64(9), NOT_EDGE_COLUMNS)] #same as board.SHIFTS
+END_GAME_TILES = 48 #is_end_game() is true with more tiles than this (75% of the board)
+STATIC_WEIGHTS = np.array([ #flat copy of computer_player.STATIC_WEIGHTS, indexed by bit
+    20, -3, 11, 8, 8, 11, -3, 20,
+    -3, -7, -4, 1, 1, -4, -7, -3,
+    11, -4, 2, 2, 2, 2, -4, 11,
+    8, 1, 2, -3, -3, 2, 1, 8,
+    8, 1, 2, -3, -3, 2, 1, 8,
+    11, -4, 2, 2, 2, 2, -4, 11,
+    -3, -7, -4, 1, 1, -4, -7, -3,
+    20, -3, 11, 8, 8, 11, -3, 20
+], dtype=np.int64)
+
+#******************* Helpers *******************#
+def to_bitboard_arrays(boards):
+    """
+    Stacks the bitboards of many boards into arrays
+    Params: list of Board instances
+    Returns: array of black bitboards, array of white bitboards (both uint64)
+    """
+    black = np.array([board.bitboards['B'] for board in boards], dtype=np.uint64)
+    white = np.array([board.bitboards['W'] for board in boards], dtype=np.uint64)
+    return black, white
+
+def unpack_bits(bitboards):
+    """
+    Expands bitboards into one 0/1 value per square
+    Params: array of N uint64 bitboards
+    Returns: N x 64 array of uint8, column i is bit i
+    """
+    as_bytes = bitboards.astype('<u8').view(np.uint8).reshape(-1, 8)
+    return np.unpackbits(as_bytes, axis=1, bitorder='little')
+
+def popcount(bitboards):
+    """
+    Counts the set bits of many bitboards
+    Params: array of N uint64 bitboards
+    Returns: array of N int64 counts
+    """
+    return unpack_bits(bitboards).sum(axis=1, dtype=np.int64)
+
+def legal_moves_masks(own, opp):
+    """
+    Vectorized board.legal_moves_mask: finds the legal moves in every position at once
+    Params: arrays of bitboards of the player to move and the opponent
+    Returns: array of bitboards of legal moves
+    """
+    empty = ~(own | opp)
+    moves = np.zeros_like(own)
+    for shift, mask in SHIFTS:
+        run_mask = opp & mask
+        run = (own << shift) & run_mask #towards higher bits, bits shifted past square 63 are dropped
+        for _ in range(5):
+            run |= (run << shift) & run_mask
+        moves |= run << shift
+        run = (own >> shift) & run_mask #towards lower bits
+        for _ in range(5):
+            run |= (run >> shift) & run_mask
+        moves |= run >> shift
+    return moves & empty
+
+#******************* Batch Evaluation *******************#
+def heuristic_scores(black, white, max_id):
+    """
+    Scores many positions at once, the same way as Computer_Player.heuristic_score (coin parity + mobility + static score)
+    Params: arrays of black and white bitboards, id of the maximizing player
+    Returns: array of float scores from max's point of view
+    """
+    black, white = np.asarray(black, dtype=np.uint64), np.asarray(white, dtype=np.uint64)
+    max_board, min_board = (black, white) if max_id == 'B' else (white, black)
+    max_bits, min_bits = unpack_bits(max_board), unpack_bits(min_board)
+    max_coins, min_coins = max_bits.sum(axis=1, dtype=np.int64), min_bits.sum(axis=1, dtype=np.int64)
+    #coin parity: minimize tiles until the end game, then maximize them
+    coin = 10 * (max_coins - min_coins) / (max_coins + min_coins)
+    coin = np.where(max_coins + min_coins > END_GAME_TILES, coin, -coin)
+    #mobility: +/-30 when one player has to pass, otherwise the relative difference in moves
+    max_moves, min_moves = popcount(legal_moves_masks(max_board, min_board)), popcount(legal_moves_masks(min_board, max_board))
+    total_moves = max_moves + min_moves
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mobility = np.where(total_moves > 0, 10 * (max_moves - min_moves) / total_moves, 0.0)
+    mobility = np.where((max_moves > 0) & (min_moves == 0), 30.0, mobility)
+    mobility = np.where((max_moves == 0) & (min_moves > 0), -30.0, mobility)
+    #static weights of max's tiles minus min's tiles
+    static = (max_bits.astype(np.int64) - min_bits.astype(np.int64)) @ STATIC_WEIGHTS
+    return coin + mobility + static
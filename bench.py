@@ -0,0 +1,198 @@
+"""
+===================================================================================
+Name: bench.py
+Author: Madi Sanchez-Forman
+Version: 5.10.23
+Decription: This script measures the speed of the engine. It counts perft nodes from
+the starting position (checking them against the known counts, so it also tests the
+move generator) and times the Board and Computer_Player calls used by the search on a
+fixed set of midgame positions, and compares the node counts and times of the search
+engines. Results are printed as JSON so runs from different commits can be compared.
+Example:
+    python bench.py --perft-depth 7 --search-depth 5 --output bench.json
+===================================================================================
+"""
+from board import Board, OTHER_ID, TILES_TO_COLOR, SIZE
+from computer_player import Computer_Player, MINIMAX, NEGAMAX
+import argparse
+import json
+import math
+import platform
+import subprocess
+import time
+
+#******************* Constants *******************#
+PERFT_COUNTS = [1, 4, 12, 56, 244, 1396, 8200, 55092, 390216, 3005288, 24571284, 212258800] #known leaf counts from the start, by depth (a pass counts as a ply)
+MIDGAME_POSITIONS = [ #(position, player to move) from random games 20-28 plies in
+    ('..................*o..o.*.*oooo.**oo*oo.*..oo*....oo.o.....o....', 'B'),
+    ('.o.*......o*.......*o...o.**o....o**o....*o*o...oo*o**..o...o...', 'B'),
+    ('.......*......*..*****....****..oo***o...oooo*...****...*..*....', 'B'),
+    ('....o.....*ooo..**o.oooo.o**oo..o*o*oo..*...o*......o**........*', 'B'),
+    ('..ooo.o..*.ooo.*..o.oooo.o**o**.o.**o....o.*o...o...**.......**.', 'B'),
+]
+
+#******************* Helpers *******************#
+def load_position(position):
+    """
+    Builds a board set to one of the benchmark positions
+    Params: position string from Board.get_position
+    Returns: instance of Board
+    """
+    board = Board('B', 'W')
+    board.set_position(position)
+    return board
+
+def perft(board, depth, cur_id):
+    """
+    Counts the leaves of the game tree to a given depth. A pass counts as a ply, and a finished game counts as one leaf
+    Params: instance of Board, depth, id of player to move
+    Returns: number of leaves
+    """
+    if depth == 0:
+        return 1
+    possible_moves = board.all_legal_moves(cur_id)
+    if not possible_moves:
+        if not board.all_legal_moves(OTHER_ID[cur_id]): #game over
+            return 1
+        return perft(board, depth - 1, OTHER_ID[cur_id])
+    nodes = 0
+    for x, y in possible_moves:
+        board.make_move(x * SIZE + y, cur_id)
+        nodes += perft(board, depth - 1, OTHER_ID[cur_id])
+        board.unmake_move(cur_id)
+    return nodes
+
+def time_calls(function, repeats):
+    """
+    Times a function by calling it many times
+    Params: function with no arguments, number of calls
+    Returns: average nanoseconds per call
+    """
+    start = time.perf_counter()
+    for _ in range(repeats):
+        function()
+    return (time.perf_counter() - start) / repeats * 1e9
+
+def git_commit():
+    """
+    Finds the commit being benchmarked
+    Returns: commit hash, or None if it cannot be found
+    """
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+#******************* Benchmarks *******************#
+def bench_perft(max_depth):
+    """
+    Runs perft from the starting position for every depth up to max_depth
+    Params: deepest depth to run
+    Returns: list of dictionaries with depth, nodes, whether the count is correct, seconds and nodes per second
+    """
+    results = []
+    for depth in range(1, max_depth + 1):
+        board = Board('B', 'W')
+        start = time.perf_counter()
+        nodes = perft(board, depth, 'B')
+        seconds = time.perf_counter() - start
+        expected = PERFT_COUNTS[depth] if depth < len(PERFT_COUNTS) else None
+        results.append({'depth': depth, 'nodes': nodes, 'correct': None if expected is None else nodes == expected,
+                        'seconds': seconds, 'nodes_per_second': nodes / seconds if seconds > 0 else None})
+    return results
+
+def bench_calls(repeats):
+    """
+    Times the Board and Computer_Player calls made at every search node, on each midgame position
+    Params: number of calls to time per position
+    Returns: dictionary of call name -> average nanoseconds per call over all positions
+    """
+    totals = {'all_legal_moves': 0, 'find_tiles_taken': 0, 'flip_tiles_undo_move': 0, 'make_unmake_move': 0, 'heuristic_score': 0}
+    for position, cur_id in MIDGAME_POSITIONS:
+        board = load_position(position)
+        player = Computer_Player(cur_id, 1, verbose=False)
+        tile = TILES_TO_COLOR[cur_id]
+        x, y = board.all_legal_moves(cur_id)[0]
+        tiles = board.find_tiles_taken(x, y, tile)
+        def flip_and_undo():
+            board.flip_tiles(tiles, cur_id)
+            board.undo_move(tiles, cur_id)
+        def make_and_unmake():
+            board.make_move(x * SIZE + y, cur_id)
+            board.unmake_move(cur_id)
+        totals['all_legal_moves'] += time_calls(lambda: board.all_legal_moves(cur_id), repeats)
+        totals['find_tiles_taken'] += time_calls(lambda: board.find_tiles_taken(x, y, tile), repeats)
+        totals['flip_tiles_undo_move'] += time_calls(flip_and_undo, repeats)
+        totals['make_unmake_move'] += time_calls(make_and_unmake, repeats)
+        totals['heuristic_score'] += time_calls(lambda: player.heuristic_score(board, cur_id), repeats)
+    return {name: total / len(MIDGAME_POSITIONS) for name, total in totals.items()}
+
+def bench_search(depth):
+    """
+    Runs a full minimax_AB search on each midgame position with a new Computer_Player
+    Params: depth to search
+    Returns: list of dictionaries with score, nodes, seconds and nodes per second for each position, and the totals
+    """
+    results = []
+    total_nodes, total_seconds = 0, 0
+    for position, cur_id in MIDGAME_POSITIONS:
+        board = load_position(position)
+        player = Computer_Player(cur_id, depth, verbose=False)
+        player.tt.new_search()
+        start = time.perf_counter()
+        score = player.minimax_AB(board, depth, cur_id, -math.inf, math.inf)
+        seconds = time.perf_counter() - start
+        total_nodes += player.stats.nodes
+        total_seconds += seconds
+        results.append({'position': position, 'to_move': cur_id, 'score': score, 'nodes': player.stats.nodes, 'seconds': seconds,
+                        'nodes_per_second': player.stats.nodes / seconds if seconds > 0 else None})
+    return {'depth': depth, 'positions': results, 'nodes': total_nodes, 'seconds': total_seconds,
+            'nodes_per_second': total_nodes / total_seconds if total_seconds > 0 else None}
+
+def bench_engines(depth):
+    """
+    Picks a move on each midgame position with each search engine, to compare how much of the tree they search
+    Params: depth to search
+    Returns: dictionary of engine -> totals (nodes, seconds) and the move, score and nodes for each position
+    """
+    results = {}
+    for engine in (MINIMAX, NEGAMAX):
+        positions = []
+        total_nodes, total_seconds = 0, 0
+        for position, cur_id in MIDGAME_POSITIONS:
+            board = load_position(position)
+            player = Computer_Player(cur_id, depth, verbose=False, engine=engine, endgame_empties=0)
+            move = player.find_best_move(board)
+            total_nodes += player.stats.nodes
+            total_seconds += player.stats.seconds
+            positions.append({'move': list(move), 'score': player.stats.root_scores[move], 'nodes': player.stats.nodes, 'seconds': player.stats.seconds})
+        results[engine] = {'positions': positions, 'nodes': total_nodes, 'seconds': total_seconds}
+    return {'depth': depth, 'engines': results}
+
+#******************* Main Driver Function *******************#
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the Reversi engine and print the results as JSON.')
+    parser.add_argument('--perft-depth', type=int, default=7, help='deepest perft depth from the starting position')
+    parser.add_argument('--repeats', type=int, default=2000, help='calls per position when timing single calls')
+    parser.add_argument('--search-depth', type=int, default=5, help='depth of the minimax_AB searches and engine comparison')
+    parser.add_argument('--output', default=None, help='file to write the JSON to (default: print it)')
+    args = parser.parse_args()
+    results = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'perft': bench_perft(args.perft_depth),
+        'calls_ns': bench_calls(args.repeats),
+        'search': bench_search(args.search_depth),
+        'engines': bench_engines(args.search_depth),
+    }
+    text = json.dumps(results, indent=2)
+    if args.output is None:
+        print(text)
+    else:
+        with open(args.output, 'w') as output:
+            output.write(text + '\n')
+    if any(result['correct'] is False for result in results['perft']): #a wrong node count means the move generator is broken
+        raise SystemExit("perft node counts do not match the known values")
+
+if __name__ == "__main__":
+    main()
@@ -8,16 +8,165 @@ Decription: This script defines the utility of the Reversi board.
 """
 import random
 import sys
+from array import array
 import numpy as np
 from collections import Counter
 
 #******************* Constants *******************#
 EMPTY, BLACK, WHITE = '.', '*', 'o'
 TIE, WHITE_WIN, BLACK_WIN = 0, 1, -1
+WINNER_NAMES = {TIE: 'tie', WHITE_WIN: 'W', BLACK_WIN: 'B'} #find_winner() result -> name used in text and JSON output
 TILES_TO_COLOR = {'B': '*', 'W': 'o'}
+COLOR_TO_TILES = {'*': 'B', 'o': 'W'}
+OTHER_ID = {'B': 'W', 'W': 'B'}
 SIZE, TOTAL_SPOTS = 8, 64
 DIRECTIONS = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1,1)]
 
+#******************* Bitboard Constants *******************#
+#Square (x, y) is stored in bit x * SIZE + y, so iterating bits from low to high visits the board row by row
+FULL_BOARD = (1 << TOTAL_SPOTS) - 1
+NOT_EDGE_COLUMNS = 0x7E7E7E7E7E7E7E7E #every column except the first and last, stops horizontal and diagonal rays wrapping around rows
+#Each pair of opposite directions as (shift, mask) where shift is the change in bit index (shifted left for one direction and right for the other),
+#and mask is the squares a run of opponent tiles can occupy
+SHIFTS = [(1, NOT_EDGE_COLUMNS), (7, NOT_EDGE_COLUMNS), (8, FULL_BOARD), (9, NOT_EDGE_COLUMNS)]
+
+#******************* Ray Tables *******************#
+def _ray(square, dx, dy):
+    """
+    Lists the squares from a square to the edge of the board in one direction, not counting the square itself
+    Params: bit index of the square, direction
+    Returns: tuple of bit indexes, nearest first
+    """
+    x, y = square // SIZE + dx, square % SIZE + dy
+    ray = []
+    while 0 <= x < SIZE and 0 <= y < SIZE:
+        ray.append(x * SIZE + y)
+        x, y = x + dx, y + dy
+    return tuple(ray)
+
+#Built once at import and only ever read, so any number of threads can use them. RAYS[square][d] is the ray in DIRECTIONS[d].
+#RAY_BITS[square] holds the same rays as single bit masks, leaving out rays shorter than 2 squares, which can never flip anything
+RAYS = tuple(tuple(_ray(square, dx, dy) for dx, dy in DIRECTIONS) for square in range(TOTAL_SPOTS))
+RAY_BITS = tuple(tuple(tuple(1 << i for i in ray) for ray in rays if len(ray) >= 2) for rays in RAYS)
+
+#******************* Zobrist Keys *******************#
+#One random 64 bit key per (player, square). A position's hash is the XOR of the keys of every tile on the board.
+#The generator is seeded so hashes are the same in every process, which lets hashes be saved to disk or compared across workers
+ZOBRIST_SEED = 5102023
+_zobrist_rng = random.Random(ZOBRIST_SEED)
+ZOBRIST = {'B': [_zobrist_rng.getrandbits(64) for _ in range(TOTAL_SPOTS)], 'W': [_zobrist_rng.getrandbits(64) for _ in range(TOTAL_SPOTS)]}
+ZOBRIST_FLIP = [ZOBRIST['B'][i] ^ ZOBRIST['W'][i] for i in range(TOTAL_SPOTS)] #XOR this in to change a tile from one color to the other
+ZOBRIST_SIDE = {'B': 0, 'W': _zobrist_rng.getrandbits(64)} #XOR in the player to move to tell apart the same tiles with a different player to move
+
+#******************* Bitboard Helpers *******************#
+def square_bit(x, y):
+    """
+    Finds the bit of a square on the board
+    Params: x, y coordinates of the board
+    Returns: integer with only that square's bit set
+    """
+    return 1 << (x * SIZE + y)
+
+def legal_moves_mask(own, opp):
+    """
+    Finds every legal move at once by sliding the player's tiles over runs of opponent tiles in all 8 directions
+    Params: bitboard of player to move, bitboard of opponent
+    Returns: bitboard of empty squares that are legal moves
+    """
+    empty = ~(own | opp) & FULL_BOARD
+    moves = 0
+    for shift, mask in SHIFTS: #towards higher bits
+        run_mask = opp & mask
+        run = (own << shift) & run_mask #opponent tiles directly next to ours
+        run |= (run << shift) & run_mask #a run can be at most 6 tiles long, so extend it 5 more times
+        run |= (run << shift) & run_mask
+        run |= (run << shift) & run_mask
+        run |= (run << shift) & run_mask
+        run |= (run << shift) & run_mask
+        moves |= run << shift #the square past the end of a run
+    for shift, mask in SHIFTS: #towards lower bits
+        run_mask = opp & mask
+        run = (own >> shift) & run_mask
+        run |= (run >> shift) & run_mask
+        run |= (run >> shift) & run_mask
+        run |= (run >> shift) & run_mask
+        run |= (run >> shift) & run_mask
+        run |= (run >> shift) & run_mask
+        moves |= run >> shift
+    return moves & empty
+
+def flips_mask(own, opp, square):
+    """
+    Finds the tiles that would be flipped if the player moved on a square, by walking the square's rays
+    Params: bitboard of player to move, bitboard of opponent, bit index of an empty square (an occupied square is not checked, the caller has to)
+    Returns: bitboard of tiles that would be flipped (0 if the move flips nothing)
+    """
+    flips = 0
+    for ray in RAY_BITS[square]:
+        run = 0
+        for bit in ray:
+            if opp & bit: #walk over opponent tiles
+                run |= bit
+            else:
+                if own & bit: #the run is only flipped if it ends on one of our tiles
+                    flips |= run
+                break
+    return flips
+
+def can_flip(own, opp, square):
+    """
+    Checks if moving on a square would flip anything, stopping at the first ray that does
+    Params: bitboard of player to move, bitboard of opponent, bit index of the move
+    Returns: True/False
+    """
+    for ray in RAY_BITS[square]:
+        if not opp & ray[0]: #a run of opponent tiles has to start next to the square
+            continue
+        for bit in ray[1:]:
+            if not opp & bit:
+                if own & bit:
+                    return True
+                break
+    return False
+
+def mask_to_moves(mask):
+    """
+    Converts a bitboard into a list of x,y coordinates
+    Params: bitboard
+    Returns: list of [x, y] for every set bit, in row-major order
+    """
+    moves = []
+    while mask:
+        low_bit = mask & -mask
+        square = low_bit.bit_length() - 1
+        moves.append([square >> 3, square & 7])
+        mask ^= low_bit
+    return moves
+
+def hash_bitboards(black, white):
+    """
+    Computes the Zobrist hash of a position from scratch
+    Params: bitboard of black tiles, bitboard of white tiles
+    Returns: 64 bit hash of the tiles on the board
+    """
+    key = 0
+    for x, y in mask_to_moves(black):
+        key ^= ZOBRIST['B'][x * SIZE + y]
+    for x, y in mask_to_moves(white):
+        key ^= ZOBRIST['W'][x * SIZE + y]
+    return key
+
+def moves_to_mask(moves):
+    """
+    Converts a list of x,y coordinates into a bitboard
+    Params: list of [x, y] coordinates
+    Returns: bitboard with each coordinate's bit set
+    """
+    mask = 0
+    for x, y in moves:
+        mask |= 1 << (x * SIZE + y)
+    return mask
+
 #******************* Board Class *******************#
 class Board():
 
@@ -25,7 +174,18 @@ class Board():
         """
         Initalizes board class, which handles functionality of the Reversi game
         """
-        self.array = self.init_board() #2D array that represents board 
+        self.bitboards = self.init_board() #maps id -> 64 bit int with a bit set for each of that player's tiles
+        self.hash = hash_bitboards(self.bitboards['B'], self.bitboards['W']) #Zobrist hash of the tiles, kept up to date by flip_tiles/undo_move and make_move/unmake_move
+        self.counts = {'B': self.bitboards['B'].bit_count(), 'W': self.bitboards['W'].bit_count()} #number of tiles per player, kept up to date by flip_tiles/undo_move and make_move/unmake_move
+        self.empties = TOTAL_SPOTS - self.counts['B'] - self.counts['W'] #number of empty squares, kept up to date by flip_tiles/undo_move and make_move/unmake_move
+        self.legal_cache = {} #maps id -> bitboard of legal moves in the current position, filled as they are needed
+        self.cache_stack = [] #legal_cache of each position before a flip_tiles, so undo_move can bring it back
+        #Undo stack of make_move/unmake_move, allocated once. Every move fills an empty square, so there can never be more than TOTAL_SPOTS frames
+        self.undo_flips = array('Q', bytes(8 * TOTAL_SPOTS)) #bitboard of the tiles each move flipped
+        self.undo_squares = array('B', bytes(TOTAL_SPOTS)) #flat index of the square each move was played on
+        self.undo_hashes = array('Q', bytes(8 * TOTAL_SPOTS)) #hash before each move
+        self.undo_caches = [None] * TOTAL_SPOTS #legal_cache before each move
+        self.undo_top = 0 #number of frames in use
         self.player_id = player_id #id of one player, will be either a computer or human
         self.computer_id = computer_id #always computer
         self.score = self.get_score() #Dictionary representing score of the baord
@@ -33,16 +193,31 @@ class Board():
     def init_board(self):
         """
         Initalizes the inital Reversi board
-        Returns: 2D array of board with starting positions
+        Returns: dictionary of bitboards with starting positions
+        """
+        black = square_bit(3, 4) | square_bit(4, 3)
+        white = square_bit(3, 3) | square_bit(4, 4)
+        return {'B': black, 'W': white}
+
+    @property
+    def array(self):
         """
+        2D array view of the board, built from the bitboards. Used for printing, the engine itself never reads it
+        Returns: 2D array of tiles
+        """
+        black, white = self.bitboards['B'], self.bitboards['W']
         board = []
-        for i in range(SIZE):
+        for x in range(SIZE):
             row = []
-            for j in range(SIZE):
-                row.append(EMPTY)
+            for y in range(SIZE):
+                bit = square_bit(x, y)
+                if black & bit:
+                    row.append(BLACK)
+                elif white & bit:
+                    row.append(WHITE)
+                else:
+                    row.append(EMPTY)
             board.append(row)
-        board[3][3], board[3][4] = WHITE, BLACK
-        board[4][3], board[4][4] = BLACK, WHITE
         return board
 
     def is_terminal(self):
@@ -50,29 +225,28 @@ class Board():
         Checks if game is over
         Returns: True if game is over, else otherwise
         """
-        flat_board = set([val for sublist in self.array for val in sublist]) #board as just a list
-        if EMPTY not in flat_board: #if the board is completely full
+        if self.empties == 0: #if the board is completely full
             return True
-        elif BLACK not in flat_board or WHITE not in flat_board: #if either color is completely gone
+        elif self.counts['B'] == 0 or self.counts['W'] == 0: #if either color is completely gone
             return True
-        elif self.all_legal_moves(self.player_id) == False and self.all_legal_moves(self.computer_id) == False: #or if both players are out of moves
-            print("No moves left for either player!")
+        if not self.legal_mask('B') and not self.legal_mask('W'): #or if both players are out of moves
             return True
         else:
             return False
 
+    def is_blocked(self):
+        """
+        Checks if the game ended early because neither player could move, while both still had tiles and there were empty squares
+        Returns: True/False
+        """
+        return self.empties > 0 and self.counts['B'] > 0 and self.counts['W'] > 0 and self.is_terminal()
+
     def find_winner(self):
         """
         Finds out who won the game or if it was a tie. 
         Returns: 0 -> tie, 1 -> white won, -1 -> black won 
         """
-        black_count, white_count = 0, 0
-        for x in range(SIZE):
-            for y in range(SIZE):
-                if self.array[x][y] == BLACK:
-                    black_count += 1
-                elif self.array[x][y] == WHITE:
-                    white_count += 1
+        black_count, white_count = self.counts['B'], self.counts['W']
         if white_count == black_count:
             return TIE
         elif white_count > black_count:
@@ -80,6 +254,51 @@ class Board():
         elif white_count < black_count:
             return BLACK_WIN
             
+    def get_position(self):
+        """
+        Encodes the board as text, one character per square in row-major order ('.' empty, '*' black, 'o' white)
+        Returns: string of 64 characters
+        """
+        return ''.join(''.join(row) for row in self.array)
+
+    def set_position(self, text):
+        """
+        Sets the board to a position encoded by get_position
+        Params: string of 64 characters
+        """
+        if len(text) != TOTAL_SPOTS or any(tile not in (EMPTY, BLACK, WHITE) for tile in text):
+            raise ValueError("Position must be " + str(TOTAL_SPOTS) + " characters of '" + EMPTY + BLACK + WHITE + "'")
+        black, white = 0, 0
+        for square, tile in enumerate(text):
+            if tile == BLACK:
+                black |= 1 << square
+            elif tile == WHITE:
+                white |= 1 << square
+        self.bitboards['B'], self.bitboards['W'] = black, white
+        self.hash = hash_bitboards(black, white)
+        self.counts['B'], self.counts['W'] = black.bit_count(), white.bit_count()
+        self.empties = TOTAL_SPOTS - self.counts['B'] - self.counts['W']
+        self.legal_cache = {}
+        self.cache_stack = []
+        self.undo_top = 0
+
+    def save_state(self):
+        """
+        Saves everything needed to put the board back to this position later
+        Returns: tuple describing the position
+        """
+        return (self.bitboards['B'], self.bitboards['W'], self.hash, self.counts['B'], self.counts['W'], self.empties,
+                self.legal_cache, len(self.cache_stack), self.undo_top)
+
+    def restore_state(self, state):
+        """
+        Puts the board back to a position saved with save_state, used when a search is stopped partway through a move
+        Params: tuple from save_state
+        """
+        (self.bitboards['B'], self.bitboards['W'], self.hash, self.counts['B'], self.counts['W'], self.empties, self.legal_cache,
+         stack_size, self.undo_top) = state
+        del self.cache_stack[stack_size:] #drop the caches of moves that were never undone
+
     def print_board(self):
         """
         Prints the board
@@ -87,10 +306,11 @@ class Board():
         print(" ", end = " ")
         nums = [print("" + str(i), end=" ") for i in range(1, SIZE + 1)]
         print()
+        array = self.array #build the view once instead of once per square
         for i in range(SIZE):
             print(i + 1, end=" ")
             for j in range(SIZE):
-                print(self.array[i][j], end=" ")
+                print(array[i][j], end=" ")
             print()
 
     def is_on_board(self, x, y):
@@ -107,9 +327,9 @@ class Board():
         Params: x, y coordinates of the board
         Returns: true if empty false otherwise
         """
-        if self.array[x][y] == EMPTY:
-            return True
-        return False
+        if (self.bitboards['B'] | self.bitboards['W']) & square_bit(x, y):
+            return False
+        return True
 
     def find_tiles_taken(self, xstart, ystart, tile):
         """
@@ -117,28 +337,9 @@ class Board():
         Params: x, y coordinates and tile of player making move
         Returns: list of x,y coordiantes of tiles that would be flipped (does not flip them)
         """
-        self.array[xstart][ystart] = tile #temporarily set the tile
-        flipped_tiles = [] 
-        for d in range(len(DIRECTIONS)): #for each direction
-            ctr = 0 #holds all flipped tiles
-            for i in range(SIZE): #start moving in that direction
-                dx = xstart + DIRECTIONS[d][0] * (i + 1) 
-                dy = ystart + DIRECTIONS[d][1] * (i + 1)
-                if not self.is_on_board(dx, dy): #if this move is off the board -> break
-                    ctr = 0
-                    break
-                elif self.array[dx][dy] == tile: #if we hit one of our own tiles -> break
-                    break
-                elif self.array[dx][dy] == EMPTY: #or if we run  into an empty tile -> break
-                    ctr = 0
-                    break
-                else: #otherwise we found a tile to flip
-                    ctr += 1
-            for i in range(ctr): #for each tile found
-                dx = xstart + DIRECTIONS[d][0] * (i + 1) #find its x,y coord
-                dy = ystart + DIRECTIONS[d][1] * (i + 1)
-                flipped_tiles.append([dx, dy]) # add to list
-        self.array[xstart][ystart] = EMPTY #make sure to reset the board
+        cur_id = COLOR_TO_TILES[tile]
+        own, opp = self.bitboards[cur_id], self.bitboards[OTHER_ID[cur_id]]
+        flipped_tiles = mask_to_moves(flips_mask(own, opp, xstart * SIZE + ystart))
         if len(flipped_tiles) != 0: #if there are tiles to flip, add the starting index at the end (so the starting index is always at the last index of the list, will be used later)
             flipped_tiles.append([xstart, ystart])
         return flipped_tiles #return list of tiles
@@ -148,14 +349,7 @@ class Board():
         Returns a dictionary representing score of board
         Returns: dictionary of board score
         """
-        score = {'B': 0, 'W': 0}
-        for x in range(SIZE):
-            for y in range(SIZE):
-                if self.array[x][y] == BLACK:
-                    score['B'] += 1
-                elif self.array[x][y] == WHITE:
-                    score['W'] += 1
-        return score
+        return {'B': self.counts['B'], 'W': self.counts['W']}
 
     def all_legal_moves(self, id):
         """
@@ -163,12 +357,19 @@ class Board():
         Params: id of player
         Returns: list of all legal moves
         """
-        moves = []
-        for x in range(SIZE):
-            for y in range(SIZE):
-                if self.is_legal(x, y, TILES_TO_COLOR[id]) == True:
-                    moves.append([x,y])
-        return moves
+        return mask_to_moves(self.legal_mask(id))
+
+    def legal_mask(self, id):
+        """
+        Finds the legal moves of a player as a bitboard. Each player's moves are only generated once per position, and kept until the board changes
+        Params: id of player
+        Returns: bitboard of legal moves
+        """
+        mask = self.legal_cache.get(id)
+        if mask is None:
+            mask = legal_moves_mask(self.bitboards[id], self.bitboards[OTHER_ID[id]])
+            self.legal_cache[id] = mask
+        return mask
 
     def is_legal(self, x, y, tile):
         """
@@ -180,8 +381,8 @@ class Board():
             return False
         elif not self.is_empty(x, y): #if its already been used
             return False
-        tiles = self.find_tiles_taken(x, y, tile) 
-        if len(tiles) == 0: #if there are no possible tiles to flip
+        cur_id = COLOR_TO_TILES[tile]
+        if not can_flip(self.bitboards[cur_id], self.bitboards[OTHER_ID[cur_id]], x * SIZE + y): #if there are no possible tiles to flip
             return False
         return True
     
@@ -190,25 +391,108 @@ class Board():
         Given a list of x,y coords, flip the tiles to the current id
         Params: list of tiles, id of current player
         """
-        tile = TILES_TO_COLOR[cur_id]
+        other_id = OTHER_ID[cur_id]
+        own, opp = self.bitboards[cur_id], self.bitboards[other_id]
+        key = self.hash
+        keys = ZOBRIST[cur_id]
+        mask = 0
+        flipped, placed = 0, 0
         for x, y in tiles_to_flip:
-            self.array[x][y] = tile
+            square = x * SIZE + y
+            bit = 1 << square
+            if opp & bit: #tile changes color
+                key ^= ZOBRIST_FLIP[square]
+                flipped += 1
+            elif not own & bit: #tile is placed on an empty square
+                key ^= keys[square]
+                placed += 1
+            mask |= bit
+        self.bitboards[cur_id] = own | mask
+        self.bitboards[other_id] = opp & ~mask
+        self.hash = key
+        self.cache_stack.append(self.legal_cache) #moves change with the position, so start a new cache
+        self.legal_cache = {}
+        self.counts[cur_id] += flipped + placed
+        self.counts[other_id] -= flipped
+        self.empties -= placed
             
     def undo_move(self, tiles_taken, cur_id):
         """
         Undoes a move, used in minimax so we dont have to copy board
         Params: tiles that were flipped, and id of current player
         """
-        if cur_id == 'B':
-            other_id = 'W'
-        else:
-            other_id = 'B'
-        tile = TILES_TO_COLOR[other_id]
-        for i in range(len(tiles_taken) - 1): #for each tile exceptthe last
-            x, y = tiles_taken[i][0], tiles_taken[i][1]
-            self.array[x][y] = tile #change it
-        init_x, init_y = tiles_taken[-1] 
-        self.array[init_x][init_y] = EMPTY #mark starting tile as empty
+        other_id = OTHER_ID[cur_id]
+        key = self.hash
+        flipped = 0
+        for i in range(len(tiles_taken) - 1): #every tile except the last goes back to the other player
+            square = tiles_taken[i][0] * SIZE + tiles_taken[i][1]
+            key ^= ZOBRIST_FLIP[square]
+            flipped |= 1 << square
+        init_x, init_y = tiles_taken[-1]
+        placed = init_x * SIZE + init_y
+        key ^= ZOBRIST[cur_id][placed] #starting tile is left empty
+        self.bitboards[cur_id] &= ~(flipped | (1 << placed))
+        self.bitboards[other_id] |= flipped
+        self.hash = key
+        self.legal_cache = self.cache_stack.pop() if self.cache_stack else {} #back to the previous position, whose moves may already be known
+        num_flipped = len(tiles_taken) - 1
+        self.counts[cur_id] -= num_flipped + 1
+        self.counts[other_id] += num_flipped
+        self.empties += 1
+
+    def make_move(self, square, cur_id):
+        """
+        Plays a move, recording what it changed in the undo stack instead of building a list of tiles. Used by the search, with unmake_move
+        Params: flat index of the move (x * SIZE + y), id of player moving
+        Returns: bitboard of the tiles flipped (0 if the move is not legal, then nothing is played)
+        """
+        other_id = OTHER_ID[cur_id]
+        own, opp = self.bitboards[cur_id], self.bitboards[other_id]
+        if (own | opp) >> square & 1: #flips_mask does not check that the square is empty
+            return 0
+        flips = flips_mask(own, opp, square)
+        if not flips:
+            return 0
+        top = self.undo_top
+        self.undo_flips[top] = flips
+        self.undo_squares[top] = square
+        self.undo_hashes[top] = self.hash
+        self.undo_caches[top] = self.legal_cache
+        self.undo_top = top + 1
+        key = self.hash ^ ZOBRIST[cur_id][square]
+        remaining = flips
+        while remaining:
+            low_bit = remaining & -remaining
+            key ^= ZOBRIST_FLIP[low_bit.bit_length() - 1]
+            remaining ^= low_bit
+        self.bitboards[cur_id] = own | flips | (1 << square)
+        self.bitboards[other_id] = opp & ~flips
+        self.hash = key
+        self.legal_cache = {}
+        num_flipped = flips.bit_count()
+        self.counts[cur_id] += num_flipped + 1
+        self.counts[other_id] -= num_flipped
+        self.empties -= 1
+        return flips
+
+    def unmake_move(self, cur_id):
+        """
+        Takes back the last move played with make_move
+        Params: id of player who made that move
+        """
+        top = self.undo_top - 1
+        self.undo_top = top
+        flips = self.undo_flips[top]
+        other_id = OTHER_ID[cur_id]
+        self.bitboards[cur_id] &= ~(flips | (1 << self.undo_squares[top]))
+        self.bitboards[other_id] |= flips
+        self.hash = self.undo_hashes[top]
+        self.legal_cache = self.undo_caches[top]
+        self.undo_caches[top] = None
+        num_flipped = flips.bit_count()
+        self.counts[cur_id] -= num_flipped + 1
+        self.counts[other_id] += num_flipped
+        self.empties += 1
 
     def show_valid_moves(self, id):
         """
@@ -225,6 +509,7 @@ class Board():
     def make_player_move(self):
         """
         Asks user to enter a move
+        Returns: x, y of the move played
         """
         correct_input = False
         while(not correct_input):
@@ -238,7 +523,7 @@ class Board():
                     flipped_tiles = self.find_tiles_taken(x, y, TILES_TO_COLOR[self.player_id])
                     self.flip_tiles(flipped_tiles, self.player_id)
                     correct_input = True
-                    return
+                    return x, y
                 else:
                     print("Invalid move. your valid moves are:", end = " ")
                     self.show_valid_moves(self.player_id)
@@ -249,12 +534,7 @@ class Board():
         Checks if game is close to being over, i chose to define that as at least 75% of squares being filled
         Retuns: T/F if 75% of squares are filled
         """
-        non_empty = 0
-        for x in range(SIZE):
-            for y in range(SIZE):
-                if self.array[x][y] != EMPTY:
-                    non_empty += 1
+        non_empty = TOTAL_SPOTS - self.empties
         if non_empty / TOTAL_SPOTS > .75: #if at least 75% of tiles are filled
             return True
         return False
-
@@ -0,0 +1,101 @@
+"""
+===================================================================================
+Name: build_book.py
+Author: Madi Sanchez-Forman
+Version: 5.10.23
+Decription: This script builds an opening book offline. It finds every position
+reachable in the first few plies, searches each one deeply with Computer_Player in a
+process pool, and writes the best moves in the format read by opening_book.py.
+The number of positions grows quickly with the number of plies, so deep books
+(10+ plies) take many core hours to build.
+Example:
+    python build_book.py --plies 8 --depth 8 --workers 16 --output book.bin
+===================================================================================
+"""
+from board import Board, OTHER_ID, TILES_TO_COLOR, SIZE
+from computer_player import Computer_Player
+from opening_book import book_key, write_book
+from symmetry import canonical_key, to_canonical
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+
+#******************* Constants *******************#
+TT_MEGABYTES = 32 #transposition table size of each worker's players
+
+#******************* Helpers *******************#
+_players = {} #one player per (id, depth) in each worker process, so transposition tables are reused between positions
+
+def book_positions(plies):
+    """
+    Finds every position (and player to move) reachable from the start in fewer than the given number of plies, where a pass counts as a ply.
+    Symmetric positions share a book key, so only one of them is kept
+    Params: number of plies
+    Returns: dictionary of book key -> (position string, id of player to move), only for positions where that player has a move
+    """
+    board = Board('B', 'W')
+    positions = {}
+    frontier = {book_key(board, 'B'): (board.get_position(), 'B')}
+    for _ in range(plies):
+        next_frontier = {}
+        for key, (position, cur_id) in frontier.items():
+            board.set_position(position)
+            possible_moves = board.all_legal_moves(cur_id)
+            if not possible_moves:
+                if board.all_legal_moves(OTHER_ID[cur_id]): #pass
+                    next_frontier[book_key(board, OTHER_ID[cur_id])] = (position, OTHER_ID[cur_id])
+                continue
+            positions[key] = (position, cur_id)
+            for x, y in possible_moves:
+                tiles = board.find_tiles_taken(x, y, TILES_TO_COLOR[cur_id])
+                board.flip_tiles(tiles, cur_id)
+                next_key = book_key(board, OTHER_ID[cur_id])
+                if next_key not in positions:
+                    next_frontier[next_key] = (board.get_position(), OTHER_ID[cur_id])
+                board.undo_move(tiles, cur_id)
+        frontier = next_frontier
+    return positions
+
+def search_position(key, position, cur_id, depth):
+    """
+    Searches one book position in a worker process
+    Params: book key, position string, id of player to move, depth to search
+    Returns: key, (flat index of best move in the canonical frame, depth, score)
+    """
+    if (cur_id, depth) not in _players:
+        _players[(cur_id, depth)] = Computer_Player(cur_id, depth, tt_megabytes=TT_MEGABYTES, verbose=False)
+    player = _players[(cur_id, depth)]
+    board = Board('B', 'W')
+    board.set_position(position)
+    x, y = player.find_best_move(board)
+    t = canonical_key(board, cur_id)[1]
+    return key, (to_canonical(x * SIZE + y, t), depth, player.stats.root_scores[(x, y)])
+
+def build_book(path, plies, depth, workers=None):
+    """
+    Builds and writes an opening book
+    Params: path of the book file, number of plies covered, search depth, number of processes (None for one per core)
+    Returns: number of positions in the book
+    """
+    positions = book_positions(plies)
+    entries = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(search_position, key, position, cur_id, depth) for key, (position, cur_id) in positions.items()]
+        for future in futures:
+            key, entry = future.result()
+            entries[key] = entry
+    write_book(path, entries, plies, depth)
+    return len(entries)
+
+#******************* Main Driver Function *******************#
+def main():
+    parser = argparse.ArgumentParser(description='Build an opening book by searching every early position.')
+    parser.add_argument('--plies', type=int, default=6, help='positions reached in fewer than this many plies are searched')
+    parser.add_argument('--depth', type=int, default=6, help='search depth for each position')
+    parser.add_argument('--workers', type=int, default=None, help='number of processes (default: one per core)')
+    parser.add_argument('--output', default='book.bin', help='path of the book file')
+    args = parser.parse_args()
+    count = build_book(args.output, args.plies, args.depth, args.workers)
+    print("Wrote " + str(count) + " positions to " + args.output)
+
+if __name__ == "__main__":
+    main()
@@ -10,8 +10,18 @@ https://courses.cs.washington.edu/courses/cse573/04au/Project/mini1/RUSSIA/Final
 with some slight changes. 
 ===================================================================================
 """
-from board import Board
+from board import Board, ZOBRIST_SIDE, flips_mask, mask_to_moves
+from transposition_table import TranspositionTable, DEFAULT_MEGABYTES, EXACT, LOWER, UPPER, DEPTH, FLAG, SCORE, MOVE
+from search_stats import SearchStats
+from opening_book import OpeningBook
+from endgame import EndgameSolver
+from batch_eval import heuristic_scores
+from pattern_eval import PatternEvaluator
+from concurrent.futures import ProcessPoolExecutor
 import math
+import multiprocessing
+import threading
+import time
 
 #******************* Constants ***************************#
 STATIC_WEIGHTS = [ #These are the weights of each spot on the board. The numbers are as described in the paper linked above
@@ -24,17 +34,113 @@ STATIC_WEIGHTS = [ #These are the weights of each spot on the board. The numbers
     [-3, -7, -4, 1, 1, -4, -7, -3],
     [20, -3, 11, 8, 8, 11, -3, 20]
 ]
-SIZE = 8 #size of board
+SIZE, TOTAL_SPOTS = 8, 64 #size of board and number of squares
+TIME_CHECK_INTERVAL = 1024 #number of nodes searched between checks of the clock
+MAX_PLY = 2 * TOTAL_SPOTS #deepest ply a search can reach, counting passes
+ENDGAME_EMPTIES = 10 #default number of empty squares at which the bot switches to solving the game exactly
+MINIMAX, NEGAMAX = 'minimax', 'negamax' #search engines: minimax_AB, or negamax with principal variation search and aspiration windows
+ASPIRATION_WINDOW = 4 #half width of the first aspiration window of the negamax engine, it grows 4 times each time the score falls outside
 EMPTY, BLACK, WHITE = '.', '*', 'o' #tiles
 
+#******************* Exceptions ***************************#
+class SearchTimeout(Exception):
+    """
+    Raised inside minimax_AB when a timed search runs out of time, so the unfinished iteration can be thrown away
+    """
+    pass
+
+#******************* Parallel Search Workers ***************************#
+#Each worker process of a parallel Computer_Player keeps its own Computer_Player (and so its own transposition table) between moves.
+#The best root score found so far, and the index of the root move that found it, are shared between all workers of the pool
+_worker_player = None
+_shared_alpha = None
+_shared_index = None
+_worker_root = None
+
+def _init_worker(max_id, difficulty_level, tt_megabytes, engine, pattern_path, shared_alpha, shared_index):
+    """
+    Sets up a worker process of the parallel search pool
+    Params: id of the AI, difficulty, transposition table cap in megabytes, search engine, pattern weights file or None, shared best score and shared index
+    of the move that found it
+    """
+    global _worker_player, _shared_alpha, _shared_index
+    _worker_player = Computer_Player(max_id, difficulty_level, tt_megabytes, verbose=False, engine=engine, pattern_path=pattern_path)
+    _shared_alpha, _shared_index = shared_alpha, shared_index
+
+def _search_root_move(state, move, index, depth, deadline):
+    """
+    Scores one root move in a worker process. The search starts from the best score any worker has found so far, so it can prune
+    moves that cannot beat it. To keep the result the same as a sequential search, a move that comes before the current best in the
+    search order starts just below that score, so a tie is still scored exactly and the earlier move wins it.
+    Params: board state from Board.save_state, [x, y] move, position of the move in the search order, depth to search, deadline or None
+    Returns: index, score, whether the score is exact (False means the move cannot be better than the best move), and the SearchStats of the
+    worker's search. The score is None if time ran out
+    """
+    global _worker_root
+    player = _worker_player
+    board = Board(player.max_id, player.min_id)
+    board.restore_state(state)
+    if board.hash != _worker_root: #first task of a new move
+        _worker_root = board.hash
+        player.tt.new_search()
+        player.new_move_ordering()
+    with _shared_alpha.get_lock():
+        alpha, best_index = _shared_alpha.value, _shared_index.value
+    if index < best_index:
+        alpha = math.nextafter(alpha, -math.inf)
+    x, y = move
+    board.make_move(x * SIZE + y, player.max_id)
+    player.deadline = deadline
+    player.stats = SearchStats()
+    try:
+        if player.engine == NEGAMAX:
+            score = -player.negamax(board, depth - 1, player.min_id, -math.inf, -alpha, 1)
+        else:
+            score = player.minimax_AB(board, depth - 1, player.min_id, alpha, math.inf, 1)
+    except SearchTimeout:
+        return index, None, False, player.stats
+    finally:
+        player.deadline = None
+    exact = score > alpha #anything at or below alpha is only an upper bound
+    if exact:
+        with _shared_alpha.get_lock():
+            if score > _shared_alpha.value or (score == _shared_alpha.value and index < _shared_index.value):
+                _shared_alpha.value, _shared_index.value = score, index
+    return index, score, exact, player.stats
+
 #******************* Computer Player class ***************************#
 class Computer_Player:
-    def __init__(self, max_id, difficulty_level):
+    def __init__(self, max_id, difficulty_level, tt_megabytes=DEFAULT_MEGABYTES, time_limit=None, workers=1, verbose=True, book_path=None,
+                 endgame_empties=ENDGAME_EMPTIES, endgame_wld=False, batch_leaves=False, engine=NEGAMAX,
+                 pattern_path=None):
         """
-        Initalizes an instance of Computer Player. It takes the ID of the AI and the number of plies to look ahead during MiniMax
+        Initalizes an instance of Computer Player. It takes the ID of the AI, the number of plies to look ahead during MiniMax,
+        and the memory cap of the transposition table in megabytes. If time_limit (seconds per move) is given, the bot ignores
+        the difficulty and instead searches deeper and deeper until the time runs out. With workers > 1 the root moves are
+        searched in that many processes (each with its own transposition table of tt_megabytes). Verbose controls whether the
+        chosen move is printed, and book_path is an optional opening book file built by opening_book.py. With endgame_empties or fewer
+        empty squares the game is solved exactly instead (0 turns this off), and endgame_wld only solves for win/loss/draw, which is faster.
+        With batch_leaves, all the leaves below a depth 1 node are scored together with NumPy. Engine picks the search: NEGAMAX (principal
+        variation search, deepening one ply at a time up to the difficulty with aspiration windows) or MINIMAX (the original minimax_AB).
+        Pattern_path is an optional weights file fitted by train_patterns.py; leaves are then scored by pattern_eval instead of heuristic_score
         """
         assert max_id == 'B' or 'W' #class must use an id that is either 'B' or 'W'
         assert difficulty_level > 0
+        assert time_limit is None or time_limit > 0
+        assert workers > 0
+        assert engine in (MINIMAX, NEGAMAX)
+        self.engine = engine #search used below the root
+        self.tt_megabytes = tt_megabytes
+        self.verbose = verbose #print each move chosen
+        self.workers = workers #number of processes used to search root moves
+        self.pool = None #process pool, created on the first parallel search and reused for every move after
+        self.book = None if book_path is None else OpeningBook(book_path) #memory mapped opening book, or None
+        self.endgame_empties = endgame_empties #empty squares at which the exact endgame solver takes over from minimax
+        self.endgame_solver = EndgameSolver(endgame_wld)
+        self.patterns = None if pattern_path is None else PatternEvaluator(pattern_path) #pattern evaluation, or None to use heuristic_score
+        self.batch_leaves = batch_leaves and self.patterns is None #score the children of depth 1 nodes in one batch_eval call
+        self.time_limit = time_limit #seconds allowed per move, or None to always search to the difficulty depth
+        self.max_depth = None #deepest iteration of a timed search, or None to go as deep as the time allows
         self.difficulty = difficulty_level #number of plies to look ahead
         self.max_id = max_id 
         if self.max_id == 'B':
@@ -43,66 +149,697 @@ class Computer_Player:
         else:
             self.min_id = 'B'
             self.TILES_TO_COLOR = {self.max_id: WHITE, self.min_id: BLACK}
+        self.tt = TranspositionTable(tt_megabytes) #remembers positions already searched, kept between moves
+        self.pv_moves = {} #maps position hash -> move for the principal variation of the last completed iteration
+        self.deadline = None #time.monotonic() value a timed search has to finish by
+        self.check_countdown = TIME_CHECK_INTERVAL #nodes left until the clock is checked, counted down rather than tested with a modulo so batches of nodes cannot skip a check
+        self.stats = SearchStats() #statistics of the current (or last) search
+        self.profiler = None #optional profiler (anything with enable() and disable(), such as cProfile.Profile) run during each search
+        self.recorder = None #optional game_record.GameRecordWriter that pick_move writes each move to
+        self.ponder_thread = None #background thread searching the opponent's replies while they think, or None
+        self.stop_ponder = False #tells the ponder thread to finish
+        self.pondered = {} #maps position hash -> (best move, depth, root scores) for replies searched while pondering
+        self.killers = [[None, None] for _ in range(MAX_PLY + 1)] #two most recent moves per ply that caused a cutoff, cleared every move
+        self.history = {self.max_id: [0] * TOTAL_SPOTS, self.min_id: [0] * TOTAL_SPOTS} #per player, how often a square caused a cutoff, kept between moves
+        self.cutoffs = 0 #number of nodes that were cut off
+        self.first_move_cutoffs = 0 #number of those that were cut off by the first move searched
 
     def pick_move(self, board):
         """
-        Pick_move() calls Minimax on the different possible moves and then finds the one with the highest score.
-        After the best move is found, it uses the Board class to flip the tiles
+        Pick_move() finds the best move with find_best_move() and then uses the Board class to flip the tiles. If a game recorder is attached, the move
+        (or pass) is written to it
         Params: instance of board class
-        Returns: None
+        Returns: x, y of the move chosen, or None if there were no legal moves
         """
+        move = self.find_best_move(board)
+        if self.recorder is not None:
+            self.recorder.add_move(move)
+        if move is None:
+            return None
+        best_x, best_y = move
+        best_tiles = board.find_tiles_taken(best_x, best_y, self.TILES_TO_COLOR[self.max_id])
+        board.flip_tiles(best_tiles, self.max_id) #flip tiles for that move
+        if self.verbose:
+            print("Computer chose: " + "[" + str(best_x + 1) + "," + str(best_y + 1) + "]") #print move chosen for clarity
+        return best_x, best_y
+
+    def find_best_move(self, board):
+        """
+        Find_best_move() calls Minimax on the different possible moves and then finds the one with the highest score, without playing it.
+        With a time limit it repeats the search one ply deeper each time and keeps the move from the last search that finished.
+        Positions in the opening book are answered from the book without searching, and positions near the end of the game are solved exactly
+        Params: instance of board class (left as it was)
+        Returns: x, y of the best move, or None if there were no legal moves
+        """
+        self.stop_pondering()
+        self.tt.new_search()
+        self.pv_moves = {}
+        self.stats = SearchStats()
+        self.new_move_ordering()
         possible_moves = board.all_legal_moves(self.max_id) #get all legal boards associated with our ID
+        if not possible_moves:
+            return None
+        if self.book is not None:
+            book_move = self.book.probe(board, self.max_id)
+            if book_move is not None and list(book_move) in possible_moves:
+                self.stats.book_hit = True
+                self.stats.move = book_move
+                return book_move
+        pondered = self.pondered.get(board.hash ^ ZOBRIST_SIDE[self.max_id])
+        if pondered is not None and self.time_limit is None and pondered[1] >= self.difficulty: #already searched while the opponent was thinking
+            self.stats.ponder_hit = True
+            self.stats.move, self.stats.depth, self.stats.root_scores = pondered
+            return pondered[0]
+        possible_moves = self.order_moves(possible_moves, self.max_id, None, 0)
+        start = time.perf_counter()
+        if self.profiler is not None:
+            self.profiler.enable()
+        try:
+            if board.empties <= self.endgame_empties:
+                best_x, best_y = self.solve_endgame(board)
+            elif self.time_limit is None and self.engine == MINIMAX:
+                best_x, best_y = self.search_root(board, self.difficulty, possible_moves)[0]
+            else:
+                best_x, best_y = self.iterative_deepening(board, possible_moves)
+        finally:
+            if self.profiler is not None:
+                self.profiler.disable()
+            self.stats.seconds = time.perf_counter() - start
+        self.stats.move = (best_x, best_y)
+        return best_x, best_y
+
+    def analyze(self, board, depth, top=None):
+        """
+        Analyze() scores the best moves of a position without playing any of them or printing anything. It deepens one ply at a time up to depth
+        so each iteration is ordered by the last, and keeps exact scores for the top moves (multi-PV) instead of just the best one
+        Params: instance of board class (left as it was), number of plies to search, number of moves to score exactly (None for all of them)
+        Returns: list of ((x, y), score) for the top moves, best first, with scores from max's point of view. Empty if max has to pass
+        """
+        assert depth > 0
+        assert top is None or top > 0
+        self.stop_pondering()
+        self.tt.new_search()
+        self.pv_moves = {}
+        self.stats = SearchStats()
+        self.new_move_ordering()
+        possible_moves = board.all_legal_moves(self.max_id)
+        if not possible_moves:
+            return []
+        top = len(possible_moves) if top is None else min(top, len(possible_moves))
+        possible_moves = self.order_moves(possible_moves, self.max_id, None, 0)
+        start = time.perf_counter()
+        for iteration in range(1, depth + 1):
+            scores = self.search_root_multipv(board, iteration, possible_moves, top)
+            possible_moves = sorted(possible_moves, key=lambda move: scores[move[0] * SIZE + move[1]], reverse=True) #stable, so ties keep search order
+        self.stats.seconds = time.perf_counter() - start
+        self.stats.move = tuple(possible_moves[0])
+        return [((x, y), scores[x * SIZE + y]) for x, y in possible_moves[:top]]
+
+    def solve_endgame(self, board):
+        """
+        Solve_endgame() finds the best move by searching to the end of the game with the endgame solver, scoring by final disc difference
+        Params: instance of board class
+        Returns: (x, y) of the best move
+        """
+        move, scores = self.endgame_solver.solve(board, self.max_id)
+        self.stats.nodes = self.endgame_solver.nodes
+        self.stats.depth = board.empties
+        self.stats.root_scores = scores
+        return move
+
+    def iterative_deepening(self, board, possible_moves):
+        """
+        Iterative_deepening() searches depth 1, 2, 3, ... until the time limit (or max_depth, if set) is reached. Each finished iteration sorts the root moves
+        by score and records its principal variation, so the next iteration searches the best line first. Without a time limit it stops at the difficulty.
+        The negamax engine also starts each iteration with an aspiration window around the score found two plies shallower, since the
+        evaluation swings between odd and even depths
+        Params: instance of board class, list of legal moves
+        Returns: [x, y] of the best move from the deepest finished iteration
+        """
+        start = time.monotonic()
+        max_depth = board.empties #searching deeper than the number of empty squares cannot change anything
+        if self.time_limit is None:
+            max_depth = self.difficulty
+        elif self.max_depth is not None:
+            max_depth = min(max_depth, self.max_depth)
+        best_move, guesses = possible_moves[0], [None, None] #last score found at an odd depth and at an even depth
+        for depth in range(1, max_depth + 1):
+            self.deadline = None if depth == 1 or self.time_limit is None else start + self.time_limit #depth 1 always finishes, so there is always a move to play
+            saved = board.save_state()
+            try:
+                if self.engine == NEGAMAX:
+                    best_move, scores = self.aspiration_search(board, depth, possible_moves, guesses[depth % 2])
+                    guesses[depth % 2] = scores[best_move[0] * SIZE + best_move[1]]
+                else:
+                    best_move, scores = self.search_root(board, depth, possible_moves)
+            except SearchTimeout:
+                board.restore_state(saved) #the unfinished iteration left tiles flipped, so put the board back
+                break
+            finally:
+                self.deadline = None
+            possible_moves = sorted(possible_moves, key=lambda move: scores[move[0] * SIZE + move[1]], reverse=True) #best move first next time
+            self.pv_moves = self.principal_variation(board, best_move, depth)
+            if self.time_limit is not None and time.monotonic() - start >= self.time_limit:
+                break
+        return best_move
+
+    def search_root(self, board, depth, possible_moves):
+        """
+        Search_root() plays each possible move on the board and scores it with minimax
+        Params: instance of board class, number of plies to search, list of legal moves in the order to search them
+        Returns: [x, y] of the best move, and a dictionary of flat index -> score for every move
+        """
+        if self.workers > 1:
+            return self.search_root_parallel(board, depth, possible_moves)
+        if self.engine == NEGAMAX:
+            return self.search_root_pvs(board, depth, possible_moves)
         best_val = -math.inf
-        best_x, best_y = 0, 0
-        best_tiles = []
+        best_move = possible_moves[0]
+        alpha = -math.inf
+        scores = {}
         for x,y in possible_moves: #for each move
-            tiles_flipped = board.find_tiles_taken(x, y, self.TILES_TO_COLOR[self.max_id]) #find tiles that will flip
-            move_score = self.minimax_AB(board, self.difficulty, self.max_id, -math.inf, math.inf) #score the move
+            board.make_move(x * SIZE + y, self.max_id)
+            move_score = self.minimax_AB(board, depth - 1, self.min_id, alpha, math.inf, 1) #score the move
+            board.unmake_move(self.max_id)
+            scores[x * SIZE + y] = move_score
             if move_score > best_val: #remember move with best score
-                best_x, best_y = x, y
+                best_move = [x, y]
                 best_val = move_score
-                best_tiles = tiles_flipped
-        board.flip_tiles(best_tiles, self.max_id) #flip tiles for that move
-        print("Computer chose: " + "[" + str(best_x + 1) + "," + str(best_y + 1) + "]") #print move chosen for clarity
+            alpha = max(alpha, move_score)
+        self.record_root_scores(depth, possible_moves, scores)
+        return best_move, scores
+
+    def aspiration_search(self, board, depth, possible_moves, guess):
+        """
+        Aspiration_search() searches the root with a narrow window around an earlier iteration's score, which prunes far more when the score
+        does not move much. If the best score falls outside the window, that side of the window is widened and the root is searched again
+        Params: instance of board class, number of plies to search, list of legal moves in the order to search them, expected score (or None)
+        Returns: [x, y] of the best move, and a dictionary of flat index -> score for every move
+        """
+        if guess is None or self.workers > 1 or math.isinf(guess):
+            return self.search_root(board, depth, possible_moves)
+        window = ASPIRATION_WINDOW
+        alpha, beta = guess - window, guess + window
+        while True:
+            best_move, scores = self.search_root_pvs(board, depth, possible_moves, alpha, beta)
+            best_val = scores[best_move[0] * SIZE + best_move[1]]
+            window *= 4
+            if best_val <= alpha: #failed low, every move may be worse than we thought
+                alpha = best_val - window
+            elif best_val >= beta: #failed high, the best move may be even better
+                beta = best_val + window
+            else:
+                return best_move, scores
 
-    def minimax_AB(self, board, depth, cur_id, alpha, beta):
+    def search_root_pvs(self, board, depth, possible_moves, alpha=-math.inf, beta=math.inf):
+        """
+        Search_root_pvs() scores the root moves with negamax. The first move gets the whole window, and the rest only have to show they cannot beat
+        it with a null window search, which is searched again with the whole window when they can
+        Params: instance of board class, number of plies to search, list of legal moves in the order to search them, alpha and beta values
+        Returns: [x, y] of the best move, and a dictionary of flat index -> score for the moves searched (upper bounds for moves that could not beat the best).
+        If the best score reaches beta the search stops early and only the moves searched so far are scored
+        """
+        best_val = -math.inf
+        best_move = possible_moves[0]
+        scores = {}
+        for i, (x, y) in enumerate(possible_moves):
+            board.make_move(x * SIZE + y, self.max_id)
+            if i == 0:
+                move_score = -self.negamax(board, depth - 1, self.min_id, -beta, -alpha, 1)
+            else:
+                move_score = -self.negamax(board, depth - 1, self.min_id, -math.nextafter(alpha, math.inf), -alpha, 1) #can it beat alpha at all?
+                if alpha < move_score < beta:
+                    move_score = -self.negamax(board, depth - 1, self.min_id, -beta, -alpha, 1)
+            board.unmake_move(self.max_id)
+            scores[x * SIZE + y] = move_score
+            if move_score > best_val:
+                best_move = [x, y]
+                best_val = move_score
+            if move_score > alpha:
+                alpha = move_score
+                if alpha >= beta:
+                    return best_move, scores
+        self.record_root_scores(depth, possible_moves, scores)
+        return best_move, scores
+
+    def search_root_multipv(self, board, depth, possible_moves, top):
+        """
+        Search_root_multipv() scores the root moves so that the top best are exact. Each move is searched with alpha just below the top-th best exact
+        score found so far, so a move that cannot reach the top is cut off early and one that ties with it is still scored exactly
+        Params: instance of board class, number of plies to search, list of legal moves in the order to search them, number of moves to score exactly
+        Returns: dictionary of flat index -> score for every move (upper bounds for moves outside the top)
+        """
+        scores, exact = {}, []
+        for x, y in possible_moves:
+            alpha = -math.inf if len(exact) < top else math.nextafter(exact[top - 1], -math.inf)
+            board.make_move(x * SIZE + y, self.max_id)
+            if self.engine == NEGAMAX:
+                move_score = -self.negamax(board, depth - 1, self.min_id, -math.inf, -alpha, 1)
+            else:
+                move_score = self.minimax_AB(board, depth - 1, self.min_id, alpha, math.inf, 1)
+            board.unmake_move(self.max_id)
+            scores[x * SIZE + y] = move_score
+            if move_score > alpha: #anything at or below alpha is only an upper bound
+                exact.append(move_score)
+                exact.sort(reverse=True)
+        self.record_root_scores(depth, possible_moves, scores)
+        return scores
+
+    def search_root_parallel(self, board, depth, possible_moves):
+        """
+        Search_root_parallel() scores the root moves in the process pool. The first move is searched alone so the other workers start
+        with its score to prune against (young brothers wait), then the rest are searched at the same time. The move chosen is always the
+        one a sequential search would choose, however the work is split up
+        Params: instance of board class, number of plies to search, list of legal moves in the order to search them
+        Returns: [x, y] of the best move, and a dictionary of flat index -> score (a move that could not beat the best has an upper bound)
+        Raises SearchTimeout if a timed search passes its deadline
+        """
+        pool = self.get_pool()
+        with self.shared_alpha.get_lock():
+            self.shared_alpha.value, self.shared_index.value = -math.inf, len(possible_moves)
+        state = board.save_state()
+        eldest = pool.submit(_search_root_move, state, possible_moves[0], 0, depth, self.deadline)
+        results = [eldest.result()]
+        futures = [pool.submit(_search_root_move, state, move, i, depth, self.deadline) for i, move in enumerate(possible_moves[1:], 1)]
+        results.extend(future.result() for future in futures)
+        best_val, best_move = -math.inf, possible_moves[0]
+        scores = {}
+        for index, score, exact, stats in results: #results are in search order, so ties go to the earlier move
+            self.stats.merge(stats)
+        for index, score, exact, stats in results:
+            if score is None:
+                raise SearchTimeout()
+            x, y = possible_moves[index]
+            scores[x * SIZE + y] = score
+            if exact and score > best_val:
+                best_val, best_move = score, [x, y]
+        self.record_root_scores(depth, possible_moves, scores)
+        return best_move, scores
+
+    def record_root_scores(self, depth, possible_moves, scores):
+        """
+        Record_root_scores() saves the depth and root move scores of a search that finished into the search statistics
+        Params: depth searched, list of root moves, dictionary of flat index -> score
+        """
+        self.stats.depth = depth
+        self.stats.root_scores = {(x, y): scores[x * SIZE + y] for x, y in possible_moves}
+
+    def attach_profiler(self, profiler):
+        """
+        Attach_profiler() sets a profiler to run during every search, or removes it when given None
+        Params: object with enable() and disable() methods (such as cProfile.Profile), or None
+        """
+        self.profiler = profiler
+
+    def start_pondering(self, board):
+        """
+        Start_pondering() searches the opponent's replies in a background thread while they think (input() lets other threads run while it waits).
+        Replies are searched one depth at a time, the expected reply first, and every finished search is kept in self.pondered, so find_best_move
+        can answer straight away if the search it needs is done. Anything unfinished still leaves the transposition table warm. Only bots
+        searching in one process ponder
+        Params: instance of board class, with the opponent to move (it is copied, not changed)
+        """
+        self.stop_pondering()
+        if self.workers > 1 or board.is_terminal():
+            return
+        ponder_board = Board(board.player_id, board.computer_id)
+        ponder_board.set_position(board.get_position())
+        self.pondered = {}
+        self.stop_ponder = False
+        self.deadline = math.inf #stop_pondering() moves the deadline to stop the search
+        self.ponder_thread = threading.Thread(target=self.ponder, args=(ponder_board,), daemon=True)
+        self.ponder_thread.start()
+
+    def stop_pondering(self):
+        """
+        Stop_pondering() stops the ponder thread, if one is running, and waits for it to finish
+        """
+        if self.ponder_thread is None:
+            return
+        self.stop_ponder = True
+        self.deadline = -math.inf #makes the running search raise SearchTimeout at its next clock check
+        self.ponder_thread.join()
+        self.ponder_thread = None
+        self.deadline = None
+
+    def ponder(self, board):
+        """
+        Ponder() is the body of the ponder thread. It searches the bot's reply to every opponent move at depth 1, 2, ... up to the difficulty
+        (or as deep as the board allows for a timed bot), until stop_pondering() is called
+        Params: instance of board class owned by the thread, with the opponent to move
+        """
+        self.tt.new_search()
+        self.new_move_ordering()
+        self.stats = SearchStats()
+        key = board.hash ^ ZOBRIST_SIDE[self.min_id]
+        entry = self.tt.probe(key)
+        expected = None if entry is None else entry[MOVE] #reply the last search expected
+        replies = self.order_moves(board.all_legal_moves(self.min_id), self.min_id, expected, 1)
+        max_depth = self.difficulty if self.time_limit is None else board.empties
+        for depth in range(1, max_depth + 1):
+            for x, y in replies:
+                if self.stop_ponder:
+                    return
+                board.make_move(x * SIZE + y, self.min_id)
+                possible_moves = board.all_legal_moves(self.max_id)
+                if possible_moves and board.empties > self.endgame_empties and depth <= board.empties: #the endgame solver is fast, and cannot be stopped
+                    try:
+                        best_move, scores = self.search_root(board, depth, self.order_moves(possible_moves, self.max_id, None, 0))
+                    except SearchTimeout:
+                        return
+                    self.pondered[board.hash ^ ZOBRIST_SIDE[self.max_id]] = (tuple(best_move), depth, self.stats.root_scores)
+                board.unmake_move(self.min_id)
+
+    def get_pool(self):
+        """
+        Get_pool() returns the process pool for parallel search, starting it the first time it is needed
+        Returns: ProcessPoolExecutor
+        """
+        if self.pool is None:
+            self.shared_alpha = multiprocessing.Value('d', -math.inf) #best root score so far, shared by all workers
+            self.shared_index = multiprocessing.Value('i', 0) #search order index of the move with that score
+            self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                            initargs=(self.max_id, self.difficulty, self.tt_megabytes, self.engine,
+                                                      None if self.patterns is None else self.patterns.path, self.shared_alpha, self.shared_index))
+        return self.pool
+
+    def close(self):
+        """
+        Close() stops pondering, shuts down the process pool, if one was started, and closes the opening book
+        """
+        self.stop_pondering()
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+        if self.book is not None:
+            self.book.close()
+            self.book = None
+
+    def principal_variation(self, board, best_move, depth):
+        """
+        Principal_variation() follows the best moves stored in the transposition table from the root, giving the line the last search expects
+        Params: instance of board class, [x, y] of best root move, depth of the search
+        Returns: dictionary of position hash -> flat index of the move to search first in that position
+        """
+        pv_moves = {board.hash ^ ZOBRIST_SIDE[self.max_id]: best_move[0] * SIZE + best_move[1]}
+        played = []
+        cur_id, move = self.max_id, best_move[0] * SIZE + best_move[1]
+        while move is not None and len(played) < depth:
+            if not board.make_move(move, cur_id): #stored move is not legal here (hash collision), stop following the line
+                break
+            played.append(cur_id)
+            cur_id = self.min_id if cur_id == self.max_id else self.max_id
+            key = board.hash ^ ZOBRIST_SIDE[cur_id]
+            entry = self.tt.probe(key)
+            move = None if entry is None else entry[MOVE]
+            if move is not None:
+                pv_moves[key] = move
+        for cur_id in reversed(played): #put the board back
+            board.unmake_move(cur_id)
+        return pv_moves
+
+    def minimax_AB(self, board, depth, cur_id, alpha, beta, ply=0):
         """
         mininimax_AB() performs the depth first tree search on an instance of a board for a given number of plies. 
-        params: Instance of board, depth of recursion, ID of current player, alpha and beta values
+        Positions already searched deep enough are answered from the transposition table, and moves are searched in the order given by order_moves().
+        Raises SearchTimeout if a timed search passes its deadline.
+        params: Instance of board, depth of recursion, ID of current player, alpha and beta values, number of plies from the root
         returns: best_score -> score of the board
         """
-        if depth == 0 or board.is_terminal():   #if the game is over
-            return self.heuristic_score(board, cur_id) #return heuristic value of the board
+        stats = self.stats
+        stats.nodes += 1
+        if ply > stats.max_ply:
+            stats.max_ply = ply
+        self.check_countdown -= 1
+        if self.check_countdown <= 0:
+            self.check_countdown = TIME_CHECK_INTERVAL
+            if self.deadline is not None and time.monotonic() >= self.deadline:
+                raise SearchTimeout()
+        alpha_orig, beta_orig = alpha, beta #window before the table narrows it, used to decide the bound type of the result
+        key = board.hash ^ ZOBRIST_SIDE[cur_id]
+        entry = self.tt.probe(key)
+        tt_move = self.pv_moves.get(key) #the principal variation of the last iteration is searched first
+        if entry is not None:
+            if tt_move is None:
+                tt_move = entry[MOVE]
+            if entry[DEPTH] >= depth: #stored search is at least as deep as this one
+                if entry[FLAG] == EXACT:
+                    return entry[SCORE]
+                elif entry[FLAG] == LOWER:
+                    alpha = max(alpha, entry[SCORE])
+                else:
+                    beta = min(beta, entry[SCORE])
+                if beta <= alpha:
+                    return entry[SCORE]
+        if depth == 0:
+            return self.evaluate(board, cur_id)
+        start = time.perf_counter()
+        terminal = board.is_terminal()
+        stats.movegen_seconds += time.perf_counter() - start
+        if terminal:   #if the game is over
+            return self.evaluate(board, cur_id) #return heuristic value of the board
+        if depth == 1 and self.batch_leaves:
+            best_score = self.evaluate_frontier(board, cur_id)
+            if best_score is not None:
+                self.tt.store(key, depth, EXACT, best_score, None)
+                return best_score
+        best_move = None
         if cur_id == self.max_id: #if maximizing
             best_score = -math.inf
-            possible_moves = board.all_legal_moves(cur_id) #find all possible moves
+            possible_moves = self.order_moves(self.generate_moves(board, cur_id), cur_id, tt_move, ply) #find all possible moves
             if not possible_moves: #python idiom for checking if a list is empty
-                best_score = self.minimax_AB(board, depth, self.min_id, alpha, beta) #if there are no possible moves, minimizing player goes twice
-            for x, y in possible_moves: #for each move
-                tiles = board.find_tiles_taken(x, y, self.TILES_TO_COLOR[self.max_id]) #find and flip the tiles on the board without making copy
-                board.flip_tiles(tiles, self.max_id)
-                score = self.minimax_AB(board, depth - 1, self.min_id, alpha, beta) #score the board
-                best_score = max(best_score, score) 
+                best_score = self.minimax_AB(board, depth, self.min_id, alpha, beta, ply + 1) #if there are no possible moves, minimizing player goes twice
+            for i, (x, y) in enumerate(possible_moves): #for each move
+                board.make_move(x * SIZE + y, self.max_id) #flip the tiles on the board without making copy
+                score = self.minimax_AB(board, depth - 1, self.min_id, alpha, beta, ply + 1) #score the board
+                if score > best_score:
+                    best_score, best_move = score, x * SIZE + y
                 alpha = max(alpha, score)
-                board.undo_move(tiles, self.max_id) #replace tiles
+                board.unmake_move(self.max_id) #replace tiles
                 if beta <= alpha: #if it is not better than anything we have seen -> prune
+                    self.record_cutoff(cur_id, x * SIZE + y, depth, ply, i)
                     break
         else:
             best_score = math.inf #inverse of above for min player
-            possible_moves = board.all_legal_moves(self.min_id)
+            possible_moves = self.order_moves(self.generate_moves(board, self.min_id), cur_id, tt_move, ply)
             if not possible_moves:
-                best_score = self.minimax_AB(board, depth, self.max_id, alpha, beta)
-            for x, y in possible_moves:
-                tiles = board.find_tiles_taken(x, y, self.TILES_TO_COLOR[self.min_id])
-                board.flip_tiles(tiles, self.min_id)
-                score = self.minimax_AB(board, depth - 1, self.max_id, alpha, beta)
-                best_score = min(best_score, score)
+                best_score = self.minimax_AB(board, depth, self.max_id, alpha, beta, ply + 1)
+            for i, (x, y) in enumerate(possible_moves):
+                board.make_move(x * SIZE + y, self.min_id)
+                score = self.minimax_AB(board, depth - 1, self.max_id, alpha, beta, ply + 1)
+                if score < best_score:
+                    best_score, best_move = score, x * SIZE + y
                 beta = min(beta, score)
-                board.undo_move(tiles, self.min_id)
+                board.unmake_move(self.min_id)
                 if beta <= alpha:
+                    self.record_cutoff(cur_id, x * SIZE + y, depth, ply, i)
                     break
+        if best_score <= alpha_orig: #every move failed low, the real score is at most this
+            flag = UPPER
+        elif best_score >= beta_orig: #search was cut off, the real score is at least this
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.tt.store(key, depth, flag, best_score, best_move)
         return best_score
-    
+
+    def negamax(self, board, depth, cur_id, alpha, beta, ply=0):
+        """
+        Negamax() is the same search as minimax_AB() with one branch for both players: every score is from the point of view of the player to move,
+        and a child's score is negated. After the first move, moves are searched with a null window that only shows whether they beat alpha, and
+        searched again with the whole window if they do (principal variation search). Raises SearchTimeout if a timed search passes its deadline
+        params: Instance of board, depth of recursion, ID of current player, alpha and beta values, number of plies from the root
+        returns: score of the board for the player to move
+        """
+        stats = self.stats
+        stats.nodes += 1
+        if ply > stats.max_ply:
+            stats.max_ply = ply
+        self.check_countdown -= 1
+        if self.check_countdown <= 0:
+            self.check_countdown = TIME_CHECK_INTERVAL
+            if self.deadline is not None and time.monotonic() >= self.deadline:
+                raise SearchTimeout()
+        alpha_orig, beta_orig = alpha, beta
+        key = board.hash ^ ZOBRIST_SIDE[cur_id]
+        entry = self.tt.probe(key)
+        tt_move = self.pv_moves.get(key)
+        if entry is not None:
+            if tt_move is None:
+                tt_move = entry[MOVE]
+            if entry[DEPTH] >= depth:
+                if entry[FLAG] == EXACT:
+                    return entry[SCORE]
+                elif entry[FLAG] == LOWER:
+                    alpha = max(alpha, entry[SCORE])
+                else:
+                    beta = min(beta, entry[SCORE])
+                if beta <= alpha:
+                    return entry[SCORE]
+        sign = 1 if cur_id == self.max_id else -1 #the evaluation is from max's point of view
+        if depth == 0:
+            return sign * self.evaluate(board, cur_id)
+        start = time.perf_counter()
+        terminal = board.is_terminal()
+        stats.movegen_seconds += time.perf_counter() - start
+        if terminal:
+            return sign * self.evaluate(board, cur_id)
+        if depth == 1 and self.batch_leaves:
+            best_score = self.evaluate_frontier(board, cur_id)
+            if best_score is not None:
+                best_score *= sign
+                self.tt.store(key, depth, EXACT, best_score, None)
+                return best_score
+        other_id = self.min_id if cur_id == self.max_id else self.max_id
+        best_score, best_move = -math.inf, None
+        possible_moves = self.order_moves(self.generate_moves(board, cur_id), cur_id, tt_move, ply)
+        if not possible_moves: #pass, the other player goes twice
+            best_score = -self.negamax(board, depth, other_id, -beta, -alpha, ply + 1)
+        for i, (x, y) in enumerate(possible_moves):
+            board.make_move(x * SIZE + y, cur_id)
+            if i == 0:
+                score = -self.negamax(board, depth - 1, other_id, -beta, -alpha, ply + 1)
+            else:
+                score = -self.negamax(board, depth - 1, other_id, -math.nextafter(alpha, math.inf), -alpha, ply + 1) #null window scout
+                if alpha < score < beta: #it beat alpha, so get its real score
+                    score = -self.negamax(board, depth - 1, other_id, -beta, -alpha, ply + 1)
+            board.unmake_move(cur_id)
+            if score > best_score:
+                best_score, best_move = score, x * SIZE + y
+            if score > alpha:
+                alpha = score
+                if alpha >= beta:
+                    self.record_cutoff(cur_id, x * SIZE + y, depth, ply, i)
+                    break
+        if best_score <= alpha_orig:
+            flag = UPPER
+        elif best_score >= beta_orig:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.tt.store(key, depth, flag, best_score, best_move)
+        return best_score
+
+    def generate_moves(self, board, cur_id):
+        """
+        Generate_moves() finds the legal moves of a player, timing it for the search statistics
+        params: instance of Board class, id of player moving
+        returns: list of legal moves
+        """
+        start = time.perf_counter()
+        possible_moves = board.all_legal_moves(cur_id)
+        self.stats.movegen_seconds += time.perf_counter() - start
+        return possible_moves
+
+    def evaluate(self, board, cur_id):
+        """
+        Evaluate() scores a leaf with the pattern evaluation if there is one and heuristic_score() otherwise, counting and timing it for the search statistics
+        params: instance of Board class, id of current player
+        returns: float score of board from max's point of view
+        """
+        start = time.perf_counter()
+        if self.patterns is not None:
+            other_id = self.min_id if cur_id == self.max_id else self.max_id
+            score = self.patterns.score(board.bitboards[cur_id], board.bitboards[other_id]) #weights are fitted for the player to move
+            if cur_id != self.max_id:
+                score = -score
+        else:
+            score = self.heuristic_score(board, cur_id)
+        self.stats.eval_seconds += time.perf_counter() - start
+        self.stats.leaves += 1
+        return score
+
+    def evaluate_frontier(self, board, cur_id):
+        """
+        Evaluate_frontier() scores every child of a depth 1 node with one call to batch_eval.heuristic_scores(), and returns the best for the player moving.
+        This gives the same score as searching the children one at a time, without pruning
+        params: instance of Board class, id of current player
+        returns: float score of the node, or None if the player has to pass (then the node is searched normally)
+        """
+        start = time.perf_counter()
+        own, opp = board.bitboards[cur_id], board.bitboards[self.min_id if cur_id == self.max_id else self.max_id]
+        moves = mask_to_moves(board.legal_mask(cur_id))
+        self.stats.movegen_seconds += time.perf_counter() - start
+        if not moves:
+            return None
+        start = time.perf_counter()
+        children_own, children_opp = [], []
+        for x, y in moves:
+            flips = flips_mask(own, opp, x * SIZE + y)
+            children_own.append(own | flips | (1 << (x * SIZE + y)))
+            children_opp.append(opp & ~flips)
+        black, white = (children_own, children_opp) if cur_id == 'B' else (children_opp, children_own)
+        scores = heuristic_scores(black, white, self.max_id)
+        self.stats.eval_seconds += time.perf_counter() - start
+        self.stats.nodes += len(moves)
+        self.stats.leaves += len(moves)
+        self.check_countdown -= len(moves)
+        return float(scores.max()) if cur_id == self.max_id else float(scores.min())
+
+    def order_moves(self, possible_moves, cur_id, tt_move, ply):
+        """
+        Order_moves() sorts moves so the ones most likely to cause a cutoff are searched first: the move from the principal variation or
+        transposition table, then the killer moves for this ply, then the rest by static weight of the square (corners first, X-squares last)
+        with ties broken by the history table
+        params: list of legal moves, id of player moving, flat index of the stored best move (or None), number of plies from the root
+        returns: list of moves in the order they should be searched
+        """
+        killers = self.killers[ply]
+        history = self.history[cur_id]
+        def priority(move):
+            square = move[0] * SIZE + move[1]
+            if square == tt_move:
+                return (3, 0, 0)
+            elif square == killers[0]:
+                return (2, 1, 0)
+            elif square == killers[1]:
+                return (2, 0, 0)
+            return (1, STATIC_WEIGHTS[move[0]][move[1]], history[square])
+        possible_moves.sort(key=priority, reverse=True)
+        return possible_moves
+
+    def record_cutoff(self, cur_id, square, depth, ply, move_number):
+        """
+        Record_cutoff() remembers a move that caused a cutoff as a killer for its ply and in the history table, and updates the cutoff counters
+        params: id of player moving, flat index of the move, depth left, number of plies from the root, position of the move in the search order
+        """
+        self.cutoffs += 1
+        self.stats.beta_cutoffs += 1
+        if move_number == 0:
+            self.first_move_cutoffs += 1
+            self.stats.first_move_cutoffs += 1
+        killers = self.killers[ply]
+        if killers[0] != square:
+            killers[1] = killers[0]
+            killers[0] = square
+        self.history[cur_id][square] += depth * depth #cutoffs close to the root count more
+
+    def new_move_ordering(self):
+        """
+        New_move_ordering() clears the killer moves and ages the history table before a new move, so older searches count less
+        """
+        for killers in self.killers:
+            killers[0] = killers[1] = None
+        for history in self.history.values():
+            for i in range(TOTAL_SPOTS):
+                history[i] //= 2
+
+    def first_move_cutoff_rate(self):
+        """
+        First_move_cutoff_rate() gives the fraction of cutoffs caused by the first move searched, a measure of how good the move ordering is
+        returns: float between 0 and 1 (0 if there were no cutoffs yet)
+        """
+        if self.cutoffs == 0:
+            return 0
+        return self.first_move_cutoffs / self.cutoffs
+
+    def reset_cutoff_counters(self):
+        """
+        Reset_cutoff_counters() sets the cutoff counters back to 0
+        """
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
     def heuristic_score(self, board, cur_id):
         """
         Heuristic_score() calculates the heuristic value of the board
@@ -137,7 +874,7 @@ class Computer_Player:
         params: instance of Board class
         returns: float mobility score of board
         """
-        max_moves, min_moves = len(board.all_legal_moves(self.max_id)), len(board.all_legal_moves(self.min_id))
+        max_moves, min_moves = board.legal_mask(self.max_id).bit_count(), board.legal_mask(self.min_id).bit_count()
         if max_moves > 0 and min_moves == 0: #want to favor bot getting two turns in a row, so if possible make note of that
             return 30
         elif max_moves == 0 and min_moves > 0: #do not want bot to give opponent two turns in a row
@@ -149,13 +886,14 @@ class Computer_Player:
 
     def static_score(self, board, cur_id):
         """
-        Static score uses the static weights array to score the board, favoring corner positions. 
+        Static score uses the static weights array to score the board, favoring corner positions. Like the other terms it is from max's point of view,
+        max's tiles add their weight and min's tiles subtract it
         params: instance of board class and id of current player
         returns: integer score of board
         """
         score = 0
-        for x in range(SIZE):
-            for y in range(SIZE):
-                if board.array[x][y] == cur_id:
-                    score += STATIC_WEIGHTS[x][y]
+        for x, y in mask_to_moves(board.bitboards[self.max_id]):
+            score += STATIC_WEIGHTS[x][y]
+        for x, y in mask_to_moves(board.bitboards[self.min_id]):
+            score -= STATIC_WEIGHTS[x][y]
         return score
\ No newline at end of file
@@ -0,0 +1,182 @@
+"""
+===================================================================================
+Name: endgame.py
+Author: Madi Sanchez-Forman
+Version: 5.10.23
+Decription: This script defines an exact endgame solver. Near the end of the game
+there are few enough empty squares to search every line to the last move, so instead
+of a heuristic the solver scores positions by the final disc difference. It works on
+the bitboards directly and uses the usual endgame speedups: moves in regions with an
+odd number of empty squares first (parity), moves that leave the opponent the fewest
+replies first (fastest-first), and a loop over the empty squares instead of full move
+generation for the last few empties. It can also just find win/loss/draw, which is faster.
+===================================================================================
+"""
+from board import legal_moves_mask, flips_mask, FULL_BOARD, OTHER_ID, SIZE
+import math
+
+#******************* Constants *******************#
+QUADRANTS = [0x000000000F0F0F0F, 0x00000000F0F0F0F0, 0x0F0F0F0F00000000, 0xF0F0F0F000000000] #regions used for parity ordering
+FASTEST_FIRST_EMPTIES = 7 #with more empties than this, moves are also ordered by opponent mobility
+SMALL_EMPTIES = 4 #with this many empties or fewer, the solver loops over the empty squares instead of generating moves
+WIN, DRAW, LOSS = 1, 0, -1
+
+#******************* Helpers *******************#
+def odd_regions(empties):
+    """
+    Finds the empty squares in quadrants with an odd number of empty squares. Moving there first tends to leave the last move in each region to us
+    Params: bitboard of empty squares
+    Returns: bitboard of empty squares in odd quadrants
+    """
+    odd = 0
+    for quadrant in QUADRANTS:
+        if (empties & quadrant).bit_count() & 1:
+            odd |= empties & quadrant
+    return odd
+
+def squares_of(mask):
+    """
+    Lists the bit indexes set in a bitboard
+    Params: bitboard
+    Returns: list of bit indexes, lowest first
+    """
+    squares = []
+    while mask:
+        low_bit = mask & -mask
+        squares.append(low_bit.bit_length() - 1)
+        mask ^= low_bit
+    return squares
+
+#******************* Endgame Solver Class *******************#
+class EndgameSolver:
+    def __init__(self, wld=False):
+        """
+        Initalizes the solver. With wld=True it only finds whether the position is a win, loss or draw, and scores are 1, 0 or -1
+        """
+        self.wld = wld
+        self.nodes = 0 #positions visited by the last solve
+
+    def solve(self, board, cur_id):
+        """
+        Solves a position exactly
+        Params: instance of Board, id of player to move
+        Returns: (x, y) of the best move (None if the player has to pass or the game is over), and a dictionary of (x, y) -> score for every move.
+        Scores are final disc difference for the player to move, or 1/0/-1 in win/loss/draw mode. A move that cannot beat the best has an upper bound
+        """
+        self.nodes = 0
+        own, opp = board.bitboards[cur_id], board.bitboards[OTHER_ID[cur_id]]
+        alpha, beta = (LOSS - 1, WIN) if self.wld else (-math.inf, math.inf)
+        best_move, best_score = None, -math.inf
+        scores = {}
+        for square, flips in self.ordered_moves(own, opp, legal_moves_mask(own, opp)):
+            score = -self.negamax(opp & ~flips, own | flips | (1 << square), -beta, -alpha, False)
+            scores[(square // SIZE, square % SIZE)] = score
+            if score > best_score:
+                best_move, best_score = (square // SIZE, square % SIZE), score
+            alpha = max(alpha, score)
+            if alpha >= beta: #in win/loss/draw mode, a win cannot be beaten
+                break
+        return best_move, scores
+
+    def final_score(self, own, opp):
+        """
+        Scores a finished game
+        Params: bitboards of the player to move and the opponent
+        Returns: disc difference, or 1/0/-1 in win/loss/draw mode
+        """
+        diff = own.bit_count() - opp.bit_count()
+        if self.wld:
+            return (diff > 0) - (diff < 0)
+        return diff
+
+    def negamax(self, own, opp, alpha, beta, passed):
+        """
+        Searches a position to the end of the game with alpha-beta pruning
+        Params: bitboards of the player to move and the opponent, alpha and beta values, whether the last player passed
+        Returns: score for the player to move
+        """
+        self.nodes += 1
+        empties = ~(own | opp) & FULL_BOARD
+        if empties.bit_count() <= SMALL_EMPTIES:
+            return self.solve_small(own, opp, alpha, beta, empties, passed)
+        moves = legal_moves_mask(own, opp)
+        if not moves:
+            if passed: #neither player can move
+                return self.final_score(own, opp)
+            return -self.negamax(opp, own, -beta, -alpha, True)
+        best_score = -math.inf
+        for square, flips in self.ordered_moves(own, opp, moves):
+            score = -self.negamax(opp & ~flips, own | flips | (1 << square), -beta, -alpha, False)
+            if score > best_score:
+                best_score = score
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        return best_score
+
+    def ordered_moves(self, own, opp, moves):
+        """
+        Orders moves for the solver: moves in odd regions first, and with enough empties, fewest opponent replies first
+        Params: bitboards of the player to move and the opponent, bitboard of legal moves
+        Returns: list of (bit index of move, bitboard of flipped tiles)
+        """
+        empties = ~(own | opp) & FULL_BOARD
+        odd = odd_regions(empties)
+        fastest_first = empties.bit_count() > FASTEST_FIRST_EMPTIES
+        keyed = []
+        for square in squares_of(moves):
+            bit = 1 << square
+            flips = flips_mask(own, opp, square)
+            key = 0 if odd & bit else 1
+            if fastest_first:
+                key = key + 2 * legal_moves_mask(opp & ~flips, own | flips | bit).bit_count() #opponent mobility counts more than parity
+            keyed.append((key, square, flips))
+        keyed.sort()
+        return [(square, flips) for key, square, flips in keyed]
+
+    def solve_small(self, own, opp, alpha, beta, empties, passed):
+        """
+        Searches the last few empty squares by trying each one directly, since with so few empties move generation costs more than it saves
+        Params: bitboards of the player to move and the opponent, alpha and beta values, bitboard of empty squares, whether the last player passed
+        Returns: score for the player to move
+        """
+        if empties & (empties - 1) == 0: #at most one empty square left
+            return self.solve_last(own, opp, empties)
+        best_score = -math.inf
+        odd = odd_regions(empties)
+        for square in squares_of(empties & odd) + squares_of(empties & ~odd): #parity order
+            flips = flips_mask(own, opp, square)
+            if not flips:
+                continue
+            self.nodes += 1
+            bit = 1 << square
+            score = -self.solve_small(opp & ~flips, own | flips | bit, -beta, -alpha, empties ^ bit, False)
+            if score > best_score:
+                best_score = score
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        return best_score
+        if best_score == -math.inf: #no legal move
+            if passed:
+                return self.final_score(own, opp)
+            return -self.solve_small(opp, own, -beta, -alpha, empties, True)
+        return best_score
+
+    def solve_last(self, own, opp, empties):
+        """
+        Scores a position with at most one empty square, where at most one move is left in the game
+        Params: bitboards of the player to move and the opponent, bitboard of the empty square (or 0)
+        Returns: score for the player to move
+        """
+        if empties:
+            self.nodes += 1
+            square = empties.bit_length() - 1
+            flips = flips_mask(own, opp, square)
+            if flips:
+                return self.final_score(own | flips | empties, opp & ~flips)
+            flips = flips_mask(opp, own, square)
+            if flips: #player to move passes, opponent takes the last square
+                return self.final_score(own & ~flips, opp | flips | empties)
+        return self.final_score(own, opp)
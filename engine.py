@@ -0,0 +1,191 @@
+"""
+===================================================================================
+Name: engine.py
+Author: Madi Sanchez-Forman
+Version: 5.10.23
+Decription: This script runs the engine as a long lived process that reads commands
+on stdin and answers on stdout, so arenas and test harnesses can keep one process
+(and its transposition tables, move ordering, opening book and pattern weights) warm
+across many games instead of starting a new interpreter per game. The engine keeps
+one Computer_Player per side, and nothing is played unless a PLAY command says so.
+Protocol: one command per line, moves are row,column from 1 to 8 like the console game
+    NEWGAME                           set the starting position, black to move
+    POSITION <64 characters> <B|W>    set a position from Board.get_position and the id to move
+    PLAY <x> <y>, PLAY PASS           play a move (or pass) for the side to move
+    SEARCH DEPTH <plies>              find the best move for the side to move, searching to a fixed depth
+    SEARCH TIME <seconds>             find the best move, deepening until the time runs out
+    STATS                             statistics of the last search
+    BOARD                             show the position
+    QUIT                              stop the engine
+Every command gets exactly one reply line:
+    OK <message>, ERR <message>
+    OVER <B|W|tie> <black tiles> <white tiles>   reply to a PLAY that ended the game
+    BEST <x> <y> <score> <depth>, BEST PASS      reply to SEARCH, score is from the side to move's point of view (- if not searched)
+    STATS <JSON object>                          see SearchStats.as_dict
+    BOARD <64 character position> <id to move>
+Example:
+    python engine.py --tt-megabytes 128 --patterns patterns.bin
+===================================================================================
+"""
+from board import Board, OTHER_ID, TILES_TO_COLOR, SIZE, WINNER_NAMES
+from computer_player import Computer_Player
+from transposition_table import DEFAULT_MEGABYTES
+import argparse
+import json
+import sys
+
+#******************* Engine Class *******************#
+class Engine:
+    def __init__(self, tt_megabytes=DEFAULT_MEGABYTES, workers=1, book_path=None, pattern_path=None):
+        """
+        Initalizes the engine at the starting position. The settings are passed to the Computer_Player of each side, created on its first search
+        """
+        self.settings = {'tt_megabytes': tt_megabytes, 'workers': workers, 'book_path': book_path, 'pattern_path': pattern_path}
+        self.players = {} #maps id -> Computer_Player, kept for the life of the process
+        self.board = Board('W', 'B')
+        self.cur_id = 'B' #id of the side to move
+        self.last_stats = None #SearchStats of the last search, or None before the first one
+
+    def get_player(self, cur_id):
+        """
+        Gives the player that searches for one side, creating it the first time
+        Params: id of the side
+        Returns: instance of Computer_Player
+        """
+        if cur_id not in self.players:
+            self.players[cur_id] = Computer_Player(cur_id, 1, verbose=False, **self.settings)
+        return self.players[cur_id]
+
+    def close(self):
+        """
+        Shuts down every player's worker pool and opening book
+        """
+        for player in self.players.values():
+            player.close()
+        self.players = {}
+
+    def execute(self, line):
+        """
+        Runs one command
+        Params: command line
+        Returns: reply line, or None to stop the engine
+        """
+        command = line.split()
+        if not command:
+            return 'ERR empty command'
+        name, args = command[0].upper(), command[1:]
+        if name == 'QUIT':
+            return None
+        elif name == 'NEWGAME':
+            self.board = Board('W', 'B')
+            self.cur_id = 'B'
+            return 'OK new game'
+        elif name == 'POSITION':
+            return self.set_position(args)
+        elif name == 'PLAY':
+            return self.play(args)
+        elif name == 'SEARCH':
+            return self.search(args)
+        elif name == 'STATS':
+            if self.last_stats is None:
+                return 'ERR no search yet'
+            return 'STATS ' + json.dumps(self.last_stats.as_dict())
+        elif name == 'BOARD':
+            return 'BOARD ' + self.board.get_position() + ' ' + self.cur_id
+        return 'ERR unknown command ' + name
+
+    def set_position(self, args):
+        """
+        Runs a POSITION command
+        Params: list of argument strings
+        Returns: reply line
+        """
+        if len(args) != 2 or args[1].upper() not in OTHER_ID:
+            return 'ERR usage: POSITION <64 characters> <B|W>'
+        board = Board('W', 'B')
+        try:
+            board.set_position(args[0])
+        except ValueError as error:
+            return 'ERR ' + str(error)
+        self.board, self.cur_id = board, args[1].upper()
+        return 'OK ' + self.cur_id + ' to move'
+
+    def play(self, args):
+        """
+        Runs a PLAY command
+        Params: list of argument strings
+        Returns: reply line
+        """
+        if self.board.is_terminal():
+            return 'ERR game is over'
+        if len(args) == 1 and args[0].upper() == 'PASS':
+            if self.board.all_legal_moves(self.cur_id):
+                return 'ERR cannot pass with legal moves'
+        else:
+            try:
+                x, y = int(args[0]) - 1, int(args[1]) - 1
+            except (IndexError, ValueError):
+                return 'ERR usage: PLAY <x> <y> or PLAY PASS'
+            if not (self.board.is_on_board(x, y) and self.board.is_legal(x, y, TILES_TO_COLOR[self.cur_id])):
+                return 'ERR illegal move'
+            self.board.make_move(x * SIZE + y, self.cur_id)
+        self.cur_id = OTHER_ID[self.cur_id]
+        if self.board.is_terminal():
+            score = self.board.get_score()
+            return 'OVER ' + WINNER_NAMES[self.board.find_winner()] + ' ' + str(score['B']) + ' ' + str(score['W'])
+        return 'OK ' + self.cur_id + ' to move'
+
+    def search(self, args):
+        """
+        Runs a SEARCH command. The board is left as it was
+        Params: list of argument strings
+        Returns: reply line
+        """
+        try:
+            mode, limit = args[0].upper(), float(args[1])
+        except (IndexError, ValueError):
+            mode, limit = None, 0
+        if mode not in ('DEPTH', 'TIME') or not limit > 0 or (mode == 'DEPTH' and limit != int(limit)):
+            return 'ERR usage: SEARCH DEPTH <plies> or SEARCH TIME <seconds>'
+        player = self.get_player(self.cur_id)
+        if mode == 'DEPTH':
+            player.difficulty, player.time_limit = int(limit), None
+        else:
+            player.time_limit = limit
+        move = player.find_best_move(self.board)
+        self.last_stats = player.stats
+        if move is None:
+            return 'BEST PASS'
+        x, y = move
+        score = player.stats.root_scores.get(tuple(move)) #a book move has no score
+        return 'BEST ' + str(x + 1) + ' ' + str(y + 1) + ' ' + ('-' if score is None else str(score)) + ' ' + str(player.stats.depth)
+
+    def run(self, commands=sys.stdin, replies=sys.stdout):
+        """
+        Answers commands until QUIT or the end of the input
+        Params: file to read commands from, file to write replies to
+        """
+        try:
+            for line in commands:
+                reply = self.execute(line)
+                if reply is None:
+                    replies.write('OK bye\n')
+                    replies.flush()
+                    return
+                replies.write(reply + '\n')
+                replies.flush() #the other end waits for each reply before sending the next command
+        finally:
+            self.close()
+
+#******************* Main Driver Function *******************#
+def main():
+    parser = argparse.ArgumentParser(description='Run the Reversi engine over a line protocol on stdin and stdout.')
+    parser.add_argument('--tt-megabytes', type=int, default=DEFAULT_MEGABYTES, help='transposition table size of each side')
+    parser.add_argument('--workers', type=int, default=1, help='number of processes each search uses')
+    parser.add_argument('--book', default=None, help='opening book file built by opening_book.py')
+    parser.add_argument('--patterns', default=None, help='pattern weights file fitted by train_patterns.py')
+    args = parser.parse_args()
+    Engine(args.tt_megabytes, args.workers, args.book, args.patterns).run()
+
+if __name__ == "__main__":
+    main()
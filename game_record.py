@@ -0,0 +1,136 @@
+"""
+===================================================================================
+Name: game_record.py
+Author: Madi Sanchez-Forman
+Version: 5.10.23
+Decription: This script defines a compact binary format for recording games, with a
+streaming writer and a generator based reader. A file is any number of games one
+after another. Each game is:
+    header  7 bytes: b'RV', version, black player type, black depth, white player type, white depth
+    moves   1 byte per move: flat square index 0-63 (x * 8 + y), or 64 for a pass
+    trailer 2 bytes: end marker 255, then the result as a signed byte (0 tie, 1 white won, -1 black won)
+A game is collected move by move as it is played and written in one go when it ends,
+so an unfinished game never reaches the file, and games are read back one at a time.
+===================================================================================
+"""
+from board import Board, OTHER_ID, TILES_TO_COLOR, SIZE
+from collections import namedtuple
+import struct
+
+#******************* Constants *******************#
+MAGIC = b'RV'
+VERSION = 1
+HEADER = struct.Struct('<2sBBBBB')
+HUMAN, COMPUTER = 0, 1 #player types
+PASS = 64 #move byte for a pass
+END = 255 #move byte that ends the list of moves
+GameRecord = namedtuple('GameRecord', ['black', 'white', 'moves', 'result']) #black/white are (type, depth), moves are (x, y) or None for a pass
+
+#******************* Writer Class *******************#
+class GameRecordWriter:
+    def __init__(self, path, append=True):
+        """
+        Initalizes the writer by opening the record file. By default new games are added after the ones already in the file
+        """
+        self.file = open(path, 'ab' if append else 'wb')
+        self.game = None #bytes of the game being played, or None between games
+
+    def start_game(self, black, white):
+        """
+        Starts a new game with its header
+        Params: (player type, depth) of black and of white, depth is 0 for humans
+        """
+        assert self.game is None
+        self.game = bytearray(HEADER.pack(MAGIC, VERSION, black[0], black[1], white[0], white[1]))
+
+    def add_move(self, move):
+        """
+        Adds one move to the current game
+        Params: (x, y) of the move, or None for a pass
+        """
+        assert self.game is not None
+        self.game.append(PASS if move is None else move[0] * SIZE + move[1])
+
+    def end_game(self, result):
+        """
+        Adds the result to the current game and writes the whole game to disk
+        Params: result from Board.find_winner (0 tie, 1 white won, -1 black won)
+        """
+        assert self.game is not None
+        self.game += struct.pack('<Bb', END, result)
+        self.file.write(self.game)
+        self.file.flush()
+        self.game = None
+
+    def write_game(self, black, white, moves, result):
+        """
+        Writes a whole game at once
+        Params: (type, depth) of black and white, list of moves ((x, y) or None for a pass), result
+        """
+        self.start_game(black, white)
+        for move in moves:
+            self.add_move(move)
+        self.end_game(result)
+
+    def close(self):
+        """
+        Closes the record file. A game that was not ended is dropped
+        """
+        self.file.close()
+
+#******************* Reader Functions *******************#
+def read_games(path):
+    """
+    Reads the games in a record file one at a time, without loading the whole file
+    Params: path of the record file
+    Returns: generator of GameRecord
+    """
+    with open(path, 'rb') as record_file:
+        while True:
+            header = record_file.read(HEADER.size)
+            if len(header) < HEADER.size: #end of file (or an incomplete game)
+                return
+            magic, version, black_type, black_depth, white_type, white_depth = HEADER.unpack(header)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(path + " is not a version " + str(VERSION) + " game record file")
+            moves = []
+            while True:
+                byte = record_file.read(1)
+                if not byte: #game was never ended
+                    return
+                if byte[0] == END:
+                    break
+                if byte[0] > PASS: #a game cut short before the writer buffered games leaves other bytes, such as the next header, among the moves
+                    raise ValueError(path + " has a corrupt game record")
+                moves.append(None if byte[0] == PASS else (byte[0] // SIZE, byte[0] % SIZE))
+            result = record_file.read(1)
+            if not result:
+                return
+            yield GameRecord((black_type, black_depth), (white_type, white_depth), moves, struct.unpack('<b', result)[0])
+
+def replay(record):
+    """
+    Replays a game through Board
+    Params: GameRecord
+    Returns: generator of (board, id of player to move, move about to be played) for every move; the board is the same object each time, updated in place
+    """
+    board = Board('B', 'W')
+    cur_id = 'B'
+    for move in record.moves:
+        yield board, cur_id, move
+        if move is not None:
+            x, y = move
+            tiles = board.find_tiles_taken(x, y, TILES_TO_COLOR[cur_id])
+            if not tiles:
+                raise ValueError("Illegal move " + str(move) + " in game record")
+            board.flip_tiles(tiles, cur_id)
+        cur_id = OTHER_ID[cur_id]
+
+def replay_games(path):
+    """
+    Replays every game in a record file, streaming both the file and the positions
+    Params: path of the record file
+    Returns: generator of (GameRecord, generator from replay())
+    """
+    for record in read_games(path):
+        yield record, replay(record)
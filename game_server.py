@@ -0,0 +1,268 @@
+"""
+===================================================================================
+Name: game_server.py
+Author: Madi Sanchez-Forman
+Version: 5.10.23
+Decription: This script runs an asyncio server that hosts many human vs bot games at
+once. Each connection is one game, kept in memory as a Board, and the bot's searches
+run in a bounded process pool so a slow search never blocks the other games. New
+games are turned away when the server is full, and every bot move has a time limit:
+the bot searches one ply deeper at a time up to its difficulty, and plays the best
+move found so far when the time runs out.
+Protocol: one command per line, moves are row,column from 1 to 8 like the console game
+    NEW <B|W> <difficulty> [seconds]  start a game as black or white, seconds is the time limit per bot move (default and cap: --max-seconds)
+    MOVE <x> <y>                      play a move
+    BOARD                             show the position
+    QUIT                              leave the game
+Replies are single lines:
+    BUSY                              server is full, the connection is closed
+    OK <message>, ERR <message>
+    BOARD <64 character position> <id to move>
+    BOT <x> <y>, BOT PASS, YOU PASS   moves played for the bot, and passes
+    TURN <legal moves>                waiting for your move, e.g. TURN 3,4 4,3 5,6
+    OVER <B|W|tie> <black tiles> <white tiles>
+Example:
+    python game_server.py --port 8765 --workers 8 --max-games 500
+    nc localhost 8765
+===================================================================================
+"""
+from board import Board, OTHER_ID, TILES_TO_COLOR, WINNER_NAMES
+from computer_player import Computer_Player
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import asyncio
+import multiprocessing
+
+#******************* Constants *******************#
+TT_MEGABYTES = 16 #transposition table size of each worker's players
+MAX_LINE = 256 #longest command accepted
+
+#******************* Search Worker *******************#
+_players = {} #one player per (id, difficulty) in each worker process, shared by every game the worker searches for
+
+def search_move(position, cur_id, difficulty, time_limit):
+    """
+    Finds the bot's move in a worker process. The search deepens one ply at a time up to the difficulty, stopping early if time runs out
+    Params: position string from Board.get_position, id of the bot, difficulty, seconds allowed
+    Returns: (x, y) of the best move, or None if the bot has to pass
+    """
+    if (cur_id, difficulty) not in _players:
+        player = Computer_Player(cur_id, difficulty, tt_megabytes=TT_MEGABYTES, time_limit=time_limit, verbose=False)
+        player.max_depth = difficulty
+        _players[(cur_id, difficulty)] = player
+    player = _players[(cur_id, difficulty)]
+    player.time_limit = time_limit
+    board = Board(OTHER_ID[cur_id], cur_id)
+    board.set_position(position)
+    return player.find_best_move(board)
+
+#******************* Game Class *******************#
+class Game:
+    def __init__(self, human_id, difficulty, seconds):
+        """
+        Initalizes a hosted game: the board, the bot's settings, and whose turn it is
+        """
+        self.board = Board(human_id, OTHER_ID[human_id])
+        self.difficulty = difficulty #depth the bot searches to
+        self.seconds = seconds #time limit of each bot move
+        self.bot_to_move = self.board.computer_id == 'B' #black goes first
+
+    def to_move(self):
+        """
+        Gives the id of the player to move
+        Returns: 'B' or 'W'
+        """
+        return self.board.computer_id if self.bot_to_move else self.board.player_id
+
+#******************* Game Server Class *******************#
+class GameServer:
+    def __init__(self, max_games=256, workers=None, max_difficulty=6, max_seconds=5.0, idle_seconds=600):
+        """
+        Initalizes the server. max_games is the most games hosted at once (admission control), workers the number of search processes
+        (None for one per core). Difficulty requests are capped at max_difficulty, and every bot move gets at most max_seconds. A game
+        whose player sends nothing for idle_seconds is dropped
+        """
+        assert max_games > 0 and max_difficulty > 0 and max_seconds > 0
+        self.max_games = max_games
+        self.workers = workers
+        self.max_difficulty = max_difficulty
+        self.max_seconds = max_seconds
+        self.idle_seconds = idle_seconds
+        self.games = 0 #number of games being hosted
+        self.pool = None #process pool, started with the server
+        self.server = None
+
+    async def start(self, host='127.0.0.1', port=8765):
+        """
+        Starts the search pool and begins accepting connections
+        Params: address and port to listen on (port 0 picks a free one)
+        Returns: the port listened on
+        """
+        #workers are spawned, not forked: a worker forked mid-game would hold copies of every open client socket, so closing a connection would not end it
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+        self.server = await asyncio.start_server(self.handle_connection, host, port, limit=MAX_LINE)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        """
+        Accepts connections until the server is closed
+        """
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def close(self):
+        """
+        Stops accepting connections and shuts down the search pool
+        """
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
+
+    async def handle_connection(self, reader, writer):
+        """
+        Hosts one game for a connection, if there is room for it
+        Params: asyncio stream reader and writer of the connection
+        """
+        if self.games >= self.max_games:
+            writer.write(b'BUSY\n')
+            await writer.drain()
+            writer.close()
+            return
+        self.games += 1
+        try:
+            await self.play(reader, writer)
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError, asyncio.LimitOverrunError, ValueError):
+            pass #client left, went quiet or sent garbage, drop the game
+        finally:
+            self.games -= 1
+            writer.close()
+
+    async def play(self, reader, writer):
+        """
+        Runs the command loop of one game
+        Params: asyncio stream reader and writer of the connection
+        """
+        def send(line):
+            writer.write(line.encode() + b'\n')
+
+        game = None
+        while True:
+            line = await asyncio.wait_for(reader.readline(), self.idle_seconds)
+            if not line: #connection closed
+                return
+            command = line.decode().split()
+            if not command:
+                continue
+            name = command[0].upper()
+            if name == 'QUIT':
+                send('OK bye')
+                await writer.drain()
+                return
+            elif name == 'NEW':
+                settings = self.parse_new(command[1:])
+                if settings is None:
+                    send('ERR usage: NEW <B|W> <difficulty> [seconds]')
+                else:
+                    game = Game(*settings)
+                    send('OK playing ' + game.board.player_id + ' against difficulty ' + str(game.difficulty) +
+                         ' with ' + str(game.seconds) + ' seconds per move')
+                    await self.advance(game, send, writer)
+            elif name == 'BOARD':
+                if game is None:
+                    send('ERR no game, send NEW first')
+                else:
+                    send('BOARD ' + game.board.get_position() + ' ' + game.to_move())
+            elif name == 'MOVE':
+                board = None if game is None else game.board
+                if board is None or board.is_terminal():
+                    send('ERR no game in progress, send NEW first')
+                    continue
+                try:
+                    x, y = int(command[1]) - 1, int(command[2]) - 1
+                except (IndexError, ValueError):
+                    send('ERR usage: MOVE <x> <y>')
+                    continue
+                if not (board.is_on_board(x, y) and board.is_legal(x, y, TILES_TO_COLOR[board.player_id])):
+                    send('ERR illegal move')
+                    continue
+                board.flip_tiles(board.find_tiles_taken(x, y, TILES_TO_COLOR[board.player_id]), board.player_id)
+                game.bot_to_move = True
+                await self.advance(game, send, writer)
+            else:
+                send('ERR unknown command ' + name)
+            await writer.drain()
+
+    def parse_new(self, args):
+        """
+        Reads the arguments of a NEW command, capping them at the server's limits
+        Params: list of argument strings
+        Returns: (id of the human, difficulty, seconds per bot move), or None if the arguments are not valid
+        """
+        try:
+            human_id = args[0].upper()
+            difficulty = min(int(args[1]), self.max_difficulty)
+            seconds = min(float(args[2]), self.max_seconds) if len(args) > 2 else self.max_seconds
+        except (IndexError, ValueError):
+            return None
+        if human_id not in OTHER_ID or difficulty < 1 or not seconds > 0:
+            return None
+        return human_id, difficulty, seconds
+
+    async def advance(self, game, send, writer):
+        """
+        Plays the bot's moves, and passes for either side, until it is the human's turn or the game is over
+        Params: instance of Game, function sending a reply line, stream writer of the connection
+        """
+        board = game.board
+        loop = asyncio.get_running_loop()
+        while not board.is_terminal():
+            if not game.bot_to_move:
+                if board.all_legal_moves(board.player_id):
+                    send('TURN ' + ' '.join(str(x + 1) + ',' + str(y + 1) for x, y in board.all_legal_moves(board.player_id)))
+                    return
+                send('YOU PASS')
+            elif not board.all_legal_moves(board.computer_id):
+                send('BOT PASS')
+            else:
+                await writer.drain() #let the client see everything so far while the bot thinks
+                x, y = await loop.run_in_executor(self.pool, search_move, board.get_position(), board.computer_id, game.difficulty, game.seconds)
+                board.flip_tiles(board.find_tiles_taken(x, y, TILES_TO_COLOR[board.computer_id]), board.computer_id)
+                send('BOT ' + str(x + 1) + ' ' + str(y + 1))
+            game.bot_to_move = not game.bot_to_move
+        score = board.get_score()
+        send('OVER ' + WINNER_NAMES[board.find_winner()] + ' ' + str(score['B']) + ' ' + str(score['W']))
+
+#******************* Main Driver Function *******************#
+async def serve(args):
+    """
+    Runs the server until interrupted
+    Params: parsed command line arguments
+    """
+    server = GameServer(args.max_games, args.workers, args.max_difficulty, args.max_seconds, args.idle_seconds)
+    port = await server.start(args.host, args.port)
+    print("Serving Reversi on " + args.host + ":" + str(port))
+    try:
+        await server.serve_forever()
+    finally:
+        await server.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Host many human vs bot Reversi games over a line protocol.')
+    parser.add_argument('--host', default='127.0.0.1', help='address to listen on')
+    parser.add_argument('--port', type=int, default=8765, help='port to listen on')
+    parser.add_argument('--workers', type=int, default=None, help='number of search processes (default: one per core)')
+    parser.add_argument('--max-games', type=int, default=256, help='most games hosted at once, more connections are turned away')
+    parser.add_argument('--max-difficulty', type=int, default=6, help='highest difficulty a game can ask for')
+    parser.add_argument('--max-seconds', type=float, default=5.0, help='longest time a bot move can take')
+    parser.add_argument('--idle-seconds', type=float, default=600, help='drop a game after this long without a command')
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
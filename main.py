@@ -9,6 +9,8 @@ othello game.
 """
 from board import Board
 from computer_player import Computer_Player
+from game_record import GameRecordWriter, HUMAN, COMPUTER
+import argparse
 import sys
 #******************* Helpers *******************#
 def get_player_color():
@@ -74,15 +76,19 @@ def show_options():
                 print("Not an option. Please choose 1 or 2. ")
     return answer
 
-def computer_vs_computer():
+def computer_vs_computer(recorder=None):
     """
     Game function for computer vs computer
+    Params: optional GameRecordWriter the game is recorded to
     """
     computer0_id, computer1_id = 'B', 'W' #initalize ids
     board = Board(computer0_id, computer1_id) #set up board
     difficulty = get_difficulty() #ask user for number of plies
     computer0 = Computer_Player(computer0_id, difficulty) #set up bots
     computer1 = Computer_Player(computer1_id, difficulty)
+    if recorder is not None:
+        recorder.start_game((COMPUTER, difficulty), (COMPUTER, difficulty))
+        computer0.recorder = computer1.recorder = recorder #bots write their own moves
     computer0_turn = True #black goes first
     while not board.is_terminal(): #while the game isnt ovre
         board.print_board() #print the board and score
@@ -91,6 +97,8 @@ def computer_vs_computer():
             print("Computer 1's Turn! Thinking...")
             if not board.all_legal_moves(board.player_id): #check to see if white goes twie
                 print("No more legal moves! Black goes again.")
+                if recorder is not None:
+                    recorder.add_move(None)
                 computer0_turn = False
             else:
                 computer0.pick_move(board) #minimax for computer 0
@@ -99,19 +107,27 @@ def computer_vs_computer():
             print("Computer 2's turn. Thinking...")
             if not board.all_legal_moves(board.computer_id): #check to see if black goes twice
                 print("No more legal moves! White goes again.")
+                if recorder is not None:
+                    recorder.add_move(None)
                 computer0_turn = True
             else:
                 computer1.pick_move(board) #minimax for computer 1
                 computer0_turn = True
     #loop broken, determine winner
+    if board.is_blocked():
+        print("No moves left for either player!")
     winner = board.find_winner() 
     print_winner(winner) #show winner
+    if recorder is not None:
+        recorder.end_game(winner)
+        recorder.close()
     sys.exit() #exit cleanly
 
 
-def computer_vs_human():
+def computer_vs_human(recorder=None, ponder=True):
     """
     Game function for human vs computer
+    Params: optional GameRecordWriter the game is recorded to, whether the bot searches while the human thinks
     """
     player_id, computer_id = get_player_color() #ask player if they want to play black or white
     computer_turn = False
@@ -120,6 +136,10 @@ def computer_vs_human():
     board = Board(player_id, computer_id) #instaniate board
     difficulty = get_difficulty() #ask user for difficulty level
     computer = Computer_Player(computer_id, difficulty) #insantiate AI
+    if recorder is not None:
+        players = {player_id: (HUMAN, 0), computer_id: (COMPUTER, difficulty)}
+        recorder.start_game(players['B'], players['W'])
+        computer.recorder = recorder #the bot writes its own moves
 
     while not board.is_terminal(): #while game isnt over
         board.print_board()
@@ -128,33 +148,51 @@ def computer_vs_human():
             print("Your turn!")
             if not board.all_legal_moves(board.player_id): #check to see if double turn
                 print("No more legal moves! Player 2 goes again.")
-                break
-            board.make_player_move() #ask user to input move
+                move = None
+            else:
+                if ponder:
+                    computer.start_pondering(board) #search the replies while waiting for input, pick_move stops it
+                move = board.make_player_move() #ask user to input move
+            if recorder is not None:
+                recorder.add_move(move)
             computer_turn = True
             # break
         else:
             print("Computer turn. Thinking...")
             if not board.all_legal_moves(board.computer_id):
                 print("No more legal moves! Player 1 goes again.")
-                break
-            computer.pick_move(board)
+                if recorder is not None:
+                    recorder.add_move(None)
+            else:
+                computer.pick_move(board)
             computer_turn = False
         
     #loop broken, determine winner
+    if board.is_blocked():
+        print("No moves left for either player!")
     winner = board.find_winner()
     print_winner(winner)
+    computer.close()
+    if recorder is not None:
+        recorder.end_game(winner)
+        recorder.close()
     sys.exit()
 
 #******************* Main Driver Function *******************#
 def main():
+    parser = argparse.ArgumentParser(description='Play Reversi against the bot, or watch two bots play.')
+    parser.add_argument('--record', default=None, help='file to append a binary record of the game to (see game_record.py)')
+    parser.add_argument('--no-ponder', action='store_true', help="don't let the bot think while it is your turn")
+    args = parser.parse_args()
+    recorder = None if args.record is None else GameRecordWriter(args.record)
     print("******************************")
     print("\tWelcome to Reversi\t")
     print("******************************")
     answer = show_options() #check to see what kind of game
     if answer == 1:
-        computer_vs_human()
+        computer_vs_human(recorder, not args.no_ponder)
     else:
-        computer_vs_computer()
+        computer_vs_computer(recorder)
     sys.exit()
 
 if __name__ == "__main__":
@@ -0,0 +1,91 @@
+"""
+===================================================================================
+Name: opening_book.py
+Author: Madi Sanchez-Forman
+Version: 5.10.23
+Decription: This script defines the on disk format of the opening book and reads it.
+The book is a hash table of fixed size slots, keyed by the Zobrist hash of a position
+and the player to move. Positions are stored once for all 8 symmetries: the key is that
+of the canonical position (see symmetry.py) and the move is stored in its frame. It is
+opened with mmap, so a lookup only reads the slots it probes and opening the book does
+not load the file. Books are built by build_book.py.
+===================================================================================
+"""
+from board import SIZE
+from symmetry import canonical_key, from_canonical
+import mmap
+import struct
+
+#******************* Constants *******************#
+MAGIC = b'RVBK'
+VERSION = 2 #version 2 keys and moves are in the canonical frame
+HEADER = struct.Struct('<4sHHIIHH') #magic, version, reserved, number of slots, number of entries, plies covered, search depth
+SLOT = struct.Struct('<QBBxxf') #canonical position key, flat index of best move in the canonical frame, depth searched, score
+NO_MOVE = 255 #move value of an unused slot
+
+#******************* Helpers *******************#
+def book_key(board, cur_id):
+    """
+    Finds the key of a position in the book, which is the same for every symmetric version of the position
+    Params: instance of Board, id of player to move
+    Returns: 64 bit key
+    """
+    return canonical_key(board, cur_id)[0]
+
+def write_book(path, entries, plies, depth):
+    """
+    Writes an opening book file. The table has twice as many slots as entries, and a collision goes to the next free slot
+    Params: path of the file, dictionary of key -> (flat index of best move in the canonical frame, depth, score), plies and depth the book was built with
+    """
+    num_slots = max(1, 2 * len(entries))
+    slots = [None] * num_slots
+    for key, entry in entries.items():
+        index = key % num_slots
+        while slots[index] is not None:
+            index = (index + 1) % num_slots
+        slots[index] = (key,) + tuple(entry)
+    with open(path, 'wb') as book_file:
+        book_file.write(HEADER.pack(MAGIC, VERSION, 0, num_slots, len(entries), plies, depth))
+        for slot in slots:
+            if slot is None:
+                book_file.write(SLOT.pack(0, NO_MOVE, 0, 0.0))
+            else:
+                book_file.write(SLOT.pack(*slot))
+
+#******************* Opening Book Class *******************#
+class OpeningBook:
+    def __init__(self, path):
+        """
+        Initalizes the book by memory mapping the file and reading its header
+        """
+        self.file = open(path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, self.num_slots, self.num_entries, self.plies, self.depth = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(path + " is not a version " + str(VERSION) + " opening book")
+
+    def probe(self, board, cur_id):
+        """
+        Looks up the best move for a position
+        Params: instance of Board, id of player to move
+        Returns: (x, y) of the best move, or None if the position is not in the book
+        """
+        key, t = canonical_key(board, cur_id)
+        index = key % self.num_slots
+        for _ in range(self.num_slots):
+            slot_key, move, depth, score = SLOT.unpack_from(self.map, HEADER.size + index * SLOT.size)
+            if move == NO_MOVE: #reached an unused slot, so the position is not stored
+                return None
+            if slot_key == key:
+                move = from_canonical(move, t)
+                return move // SIZE, move % SIZE
+            index = (index + 1) % self.num_slots
+        return None
+
+    def close(self):
+        """
+        Unmaps and closes the book file
+        """
+        self.map.close()
+        self.file.close()
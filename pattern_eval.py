@@ -0,0 +1,194 @@
+"""
+===================================================================================
+Name: pattern_eval.py
+Author: Madi Sanchez-Forman
+Version: 5.10.23
+Decription: This script defines a pattern based evaluation. The board is covered by
+lines of squares (edges, corners, diagonals and rows), and each line's contents are
+read as a ternary number (0 empty, 1 own tile, 2 opponent tile) that indexes a table
+of weights. The score of a position is the sum of the weights of all its lines, in
+discs from the point of view of the player to move. Symmetric lines share one table,
+and a line that is symmetric with itself (an edge, a diagonal) is read in one order
+with a table that gives the mirrored contents the same weight, so the score is the
+same for all 8 symmetries of a position. Every game stage has its own set of tables.
+The weights are fitted offline from recorded games by train_patterns.py and stored
+in a binary file:
+    header  16 bytes: b'RVPT', version, number of stages, weights per stage, scale
+    weights stages * weights per stage signed 16 bit integers, divided by scale when loaded
+Line indexes are computed with per-row lookup tables into one packed integer, so a
+position is scored with 16 table lookups, one unpack and one sum.
+===================================================================================
+"""
+from board import SIZE, TOTAL_SPOTS
+from symmetry import SQUARE_MAPS
+from array import array
+import struct
+
+#******************* Constants *******************#
+MAGIC = b'RVPT'
+VERSION = 2 #version 1 tables were not the same for mirrored contents
+HEADER = struct.Struct('<4sHHII') #magic, version, number of stages, weights per stage, scale
+SCALE = 256 #weights are stored as integer 256ths of a disc
+STAGES = 6 #number of game stages, each with its own weights
+FIELD_BITS = 32 #bits per line index in the packed integer
+#Each pattern is one line of squares as (x, y); the other lines of the same shape are found by applying the board symmetries
+PATTERNS = [
+    ('edge_x', [(0, 0), (0, 1), (0, 2), (0, 3), (0, 4), (0, 5), (0, 6), (0, 7), (1, 1), (1, 6)]), #edge and its two X squares
+    ('corner_3x3', [(0, 0), (0, 1), (0, 2), (1, 0), (1, 1), (1, 2), (2, 0), (2, 1), (2, 2)]),
+    ('corner_2x5', [(0, 0), (0, 1), (0, 2), (0, 3), (0, 4), (1, 0), (1, 1), (1, 2), (1, 3), (1, 4)]),
+    ('row_2', [(1, y) for y in range(SIZE)]),
+    ('row_3', [(2, y) for y in range(SIZE)]),
+    ('row_4', [(3, y) for y in range(SIZE)]),
+    ('diagonal_8', [(i, i) for i in range(8)]),
+    ('diagonal_7', [(i, i + 1) for i in range(7)]),
+    ('diagonal_6', [(i, i + 2) for i in range(6)]),
+    ('diagonal_5', [(i, i + 3) for i in range(5)]),
+    ('diagonal_4', [(i, i + 4) for i in range(4)]),
+    ('bias', []), #one weight per stage added to every position
+]
+
+#******************* Tables *******************#
+def pattern_lines():
+    """
+    Finds every line of every pattern: the pattern's squares under each symmetry, keeping one line per set of squares
+    Returns: list of (pattern number, tuple of flat indexes), and list of the first weight index of each pattern's table
+    """
+    lines, offsets, offset = [], [], 0
+    for number, (name, squares) in enumerate(PATTERNS):
+        offsets.append(offset)
+        offset += 3 ** len(squares)
+        seen = set()
+        for square_map in SQUARE_MAPS:
+            line = tuple(square_map[x * SIZE + y] for x, y in squares)
+            if frozenset(line) not in seen:
+                seen.add(frozenset(line))
+                lines.append((number, line))
+    offsets.append(offset) #total number of weights per stage
+    return lines, offsets
+
+LINES, OFFSETS = pattern_lines()
+WEIGHTS_PER_STAGE = OFFSETS[-1]
+
+def _digit_orders(squares):
+    """
+    Finds the orders a pattern's squares are read in by the symmetries that map the pattern onto itself
+    Params: list of (x, y) squares of the pattern
+    Returns: list of tuples giving where each digit moves, other than the identity
+    """
+    line = [x * SIZE + y for x, y in squares]
+    orders = set()
+    for square_map in SQUARE_MAPS:
+        mapped = [square_map[square] for square in line]
+        if set(mapped) == set(line):
+            orders.add(tuple(line.index(square) for square in mapped))
+    orders.discard(tuple(range(len(line))))
+    return sorted(orders)
+
+def canonical_indexes():
+    """
+    Finds the weight index each index shares its weight with: the smallest index of the same contents read in any of the pattern's symmetric orders.
+    Built when needed (by the trainer and write_weights), not at import
+    Returns: list of WEIGHTS_PER_STAGE canonical weight indexes
+    """
+    canonical = list(range(WEIGHTS_PER_STAGE))
+    for number, (name, squares) in enumerate(PATTERNS):
+        orders = _digit_orders(squares)
+        if not orders:
+            continue
+        powers = [3 ** digit for digit in range(len(squares))]
+        for index in range(3 ** len(squares)):
+            digits = [index // power % 3 for power in powers]
+            best = index
+            for order in orders:
+                best = min(best, sum(digit * powers[moved] for digit, moved in zip(digits, order)))
+            canonical[OFFSETS[number] + index] = OFFSETS[number] + best
+    return canonical
+
+def _packed_tables():
+    """
+    Builds the packed tables. Field i of the packed integer holds the weight index of line i. BASE puts each line at the start of its pattern's table,
+    and OWN_ROWS[r][byte] / OPP_ROWS[r][byte] add the ternary digits of the own and opponent tiles in row r
+    Returns: BASE, OWN_ROWS, OPP_ROWS
+    """
+    base = 0
+    own_rows = [[0] * 256 for _ in range(SIZE)]
+    opp_rows = [[0] * 256 for _ in range(SIZE)]
+    for i, (number, line) in enumerate(LINES):
+        shift = FIELD_BITS * i
+        base += OFFSETS[number] << shift
+        for digit, square in enumerate(line):
+            row, column = square // SIZE, square % SIZE
+            for byte in range(256):
+                if byte >> column & 1:
+                    own_rows[row][byte] += 3 ** digit << shift
+                    opp_rows[row][byte] += 2 * 3 ** digit << shift
+    return base, tuple(tuple(row) for row in own_rows), tuple(tuple(row) for row in opp_rows)
+
+BASE, OWN_ROWS, OPP_ROWS = _packed_tables() #built once at import and only read
+PACKED_BYTES = FIELD_BITS // 8 * len(LINES)
+UNPACK = struct.Struct('<' + str(len(LINES)) + 'I')
+
+#******************* Helpers *******************#
+def line_indexes(own, opp):
+    """
+    Finds the weight index of every line in a position
+    Params: bitboards of the player to move and the opponent
+    Returns: tuple of weight indexes, one per line
+    """
+    packed = (BASE + OWN_ROWS[0][own & 255] + OWN_ROWS[1][own >> 8 & 255] + OWN_ROWS[2][own >> 16 & 255] + OWN_ROWS[3][own >> 24 & 255] +
+              OWN_ROWS[4][own >> 32 & 255] + OWN_ROWS[5][own >> 40 & 255] + OWN_ROWS[6][own >> 48 & 255] + OWN_ROWS[7][own >> 56] +
+              OPP_ROWS[0][opp & 255] + OPP_ROWS[1][opp >> 8 & 255] + OPP_ROWS[2][opp >> 16 & 255] + OPP_ROWS[3][opp >> 24 & 255] +
+              OPP_ROWS[4][opp >> 32 & 255] + OPP_ROWS[5][opp >> 40 & 255] + OPP_ROWS[6][opp >> 48 & 255] + OPP_ROWS[7][opp >> 56])
+    return UNPACK.unpack(packed.to_bytes(PACKED_BYTES, 'little'))
+
+def stage_of(own, opp):
+    """
+    Finds the game stage of a position from the number of tiles on the board
+    Params: bitboards of the two players
+    Returns: stage number from 0 to STAGES - 1
+    """
+    return min(STAGES - 1, ((own | opp).bit_count() - 4) * STAGES // (TOTAL_SPOTS - 4))
+
+def write_weights(path, stages):
+    """
+    Writes a weights file. Every index is written with the weight of its canonical index, so mirrored contents score the same
+    Params: path of the file, list of STAGES sequences of WEIGHTS_PER_STAGE weights in discs
+    """
+    assert len(stages) == STAGES
+    canonical = canonical_indexes()
+    with open(path, 'wb') as weights_file:
+        weights_file.write(HEADER.pack(MAGIC, VERSION, STAGES, WEIGHTS_PER_STAGE, SCALE))
+        for weights in stages:
+            assert len(weights) == WEIGHTS_PER_STAGE
+            packed = array('h', (max(-32768, min(32767, round(weights[index] * SCALE))) for index in canonical))
+            if struct.pack('=h', 1) != struct.pack('<h', 1): #file is little endian
+                packed.byteswap()
+            weights_file.write(packed.tobytes())
+
+#******************* Pattern Evaluator Class *******************#
+class PatternEvaluator:
+    def __init__(self, path):
+        """
+        Initalizes the evaluator by reading a weights file written by write_weights
+        """
+        with open(path, 'rb') as weights_file:
+            magic, version, stages, weights_per_stage, scale = HEADER.unpack(weights_file.read(HEADER.size))
+            if magic != MAGIC or version != VERSION or stages != STAGES or weights_per_stage != WEIGHTS_PER_STAGE:
+                raise ValueError(path + " is not a version " + str(VERSION) + " pattern weights file for these patterns")
+            self.stages = []
+            for _ in range(stages):
+                weights = array('h')
+                weights.frombytes(weights_file.read(2 * weights_per_stage))
+                if struct.pack('=h', 1) != struct.pack('<h', 1):
+                    weights.byteswap()
+                self.stages.append([weight / scale for weight in weights]) #plain list of floats, the fastest to index
+        self.path = path
+
+    def score(self, own, opp):
+        """
+        Scores a position
+        Params: bitboards of the player to move and the opponent
+        Returns: expected final disc difference for the player to move
+        """
+        weights = self.stages[stage_of(own, opp)]
+        return sum(map(weights.__getitem__, line_indexes(own, opp)))
@@ -0,0 +1,73 @@
+"""
+===================================================================================
+Name: search_stats.py
+Author: Madi Sanchez-Forman
+Version: 5.10.23
+Decription: This script defines the statistics Computer_Player records for each
+search, so searches can be measured without reading printed output.
+===================================================================================
+"""
+
+#******************* Search Stats Class *******************#
+class SearchStats:
+    def __init__(self):
+        """
+        Initalizes empty statistics for one search
+        """
+        self.nodes = 0 #positions visited by minimax
+        self.leaves = 0 #positions scored by the evaluation
+        self.beta_cutoffs = 0 #nodes where the search was cut off
+        self.first_move_cutoffs = 0 #cutoffs caused by the first move searched
+        self.depth = 0 #depth of the deepest search that finished
+        self.max_ply = 0 #deepest ply visited, counting passes
+        self.movegen_seconds = 0.0 #time spent generating legal moves (including terminal checks)
+        self.eval_seconds = 0.0 #time spent in the evaluation
+        self.seconds = 0.0 #total time of the search
+        self.root_scores = {} #maps (x, y) -> score of each root move in the deepest search that finished
+        self.move = None #(x, y) of the move chosen
+        self.book_hit = False #True if the move came from the opening book and no search was done
+        self.ponder_hit = False #True if the move was found while pondering on the opponent's time and no search was done
+
+    def nodes_per_second(self):
+        """
+        Finds the search speed
+        Returns: nodes searched per second (0 if no time has passed)
+        """
+        if self.seconds <= 0:
+            return 0
+        return self.nodes / self.seconds
+
+    def merge(self, other):
+        """
+        Adds the counts and times of a search done elsewhere (such as in a worker process) into these statistics
+        Params: instance of SearchStats
+        """
+        self.nodes += other.nodes
+        self.leaves += other.leaves
+        self.beta_cutoffs += other.beta_cutoffs
+        self.first_move_cutoffs += other.first_move_cutoffs
+        self.max_ply = max(self.max_ply, other.max_ply)
+        self.movegen_seconds += other.movegen_seconds
+        self.eval_seconds += other.eval_seconds
+
+    def as_dict(self):
+        """
+        Converts the statistics into plain values, for logging or JSON
+        Returns: dictionary of statistics
+        """
+        return {
+            'nodes': self.nodes,
+            'leaves': self.leaves,
+            'beta_cutoffs': self.beta_cutoffs,
+            'first_move_cutoffs': self.first_move_cutoffs,
+            'depth': self.depth,
+            'max_ply': self.max_ply,
+            'movegen_seconds': self.movegen_seconds,
+            'eval_seconds': self.eval_seconds,
+            'seconds': self.seconds,
+            'nodes_per_second': self.nodes_per_second(),
+            'root_scores': [{'move': list(move), 'score': score} for move, score in self.root_scores.items()],
+            'move': None if self.move is None else list(self.move),
+            'book_hit': self.book_hit,
+            'ponder_hit': self.ponder_hit,
+        }
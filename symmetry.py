@@ -0,0 +1,110 @@
+"""
+===================================================================================
+Name: symmetry.py
+Author: Madi Sanchez-Forman
+Version: 5.10.23
+Decription: This script maps Reversi positions onto a canonical member of their
+symmetry group. The board has 8 symmetries (4 rotations, each with or without a
+mirror), and all 8 versions of a position have the same best move up to the same
+symmetry, so any store of positions (opening books, analysis caches) only needs one
+of them. The canonical version is the one whose (black, white) bitboards are the
+smallest, and moves are mapped into that frame when stored and back out when read.
+Transforms are table driven: each one is a lookup table per row of the board.
+===================================================================================
+"""
+from board import SIZE, TOTAL_SPOTS, ZOBRIST_SIDE, hash_bitboards
+
+#******************* Constants *******************#
+#Each transform maps square (x, y) to a new (x, y)
+TRANSFORMS = [
+    lambda x, y: (x, y), #identity
+    lambda x, y: (y, SIZE - 1 - x), #rotate 90
+    lambda x, y: (SIZE - 1 - x, SIZE - 1 - y), #rotate 180
+    lambda x, y: (SIZE - 1 - y, x), #rotate 270
+    lambda x, y: (SIZE - 1 - x, y), #mirror top to bottom
+    lambda x, y: (x, SIZE - 1 - y), #mirror left to right
+    lambda x, y: (y, x), #mirror on the main diagonal
+    lambda x, y: (SIZE - 1 - y, SIZE - 1 - x), #mirror on the other diagonal
+]
+IDENTITY = 0
+
+#******************* Tables *******************#
+#SQUARE_MAPS[t][square] is the flat index square moves to under transform t, and INVERSE[t] is the transform that undoes t
+SQUARE_MAPS = tuple(tuple(x * SIZE + y for x, y in (transform(square // SIZE, square % SIZE) for square in range(TOTAL_SPOTS)))
+                    for transform in TRANSFORMS)
+INVERSE = tuple(next(u for u in range(len(TRANSFORMS)) if all(SQUARE_MAPS[u][SQUARE_MAPS[t][square]] == square for square in range(TOTAL_SPOTS)))
+                for t in range(len(TRANSFORMS)))
+
+def _row_tables(square_map):
+    """
+    Builds the lookup tables of one transform: for every row and every byte of tiles in that row, the bitboard those tiles move to
+    Params: tuple of flat index -> transformed flat index
+    Returns: tuple of SIZE tuples of 256 bitboards
+    """
+    tables = []
+    for row in range(SIZE):
+        table = []
+        for byte in range(256):
+            mask = 0
+            for column in range(SIZE):
+                if byte >> column & 1:
+                    mask |= 1 << square_map[row * SIZE + column]
+            table.append(mask)
+        tables.append(tuple(table))
+    return tuple(tables)
+
+ROW_TABLES = tuple(_row_tables(square_map) for square_map in SQUARE_MAPS) #built once at import and only read
+
+#******************* Transform Functions *******************#
+def transform_bitboard(bitboard, t):
+    """
+    Applies a symmetry to a bitboard, one row (byte) at a time
+    Params: bitboard, index of the transform
+    Returns: transformed bitboard
+    """
+    tables = ROW_TABLES[t]
+    return (tables[0][bitboard & 255] | tables[1][bitboard >> 8 & 255] | tables[2][bitboard >> 16 & 255] | tables[3][bitboard >> 24 & 255] |
+            tables[4][bitboard >> 32 & 255] | tables[5][bitboard >> 40 & 255] | tables[6][bitboard >> 48 & 255] | tables[7][bitboard >> 56])
+
+def canonical(black, white):
+    """
+    Finds the canonical version of a position: the symmetry with the smallest black bitboard, ties broken by the smallest white bitboard
+    Params: bitboards of black and white tiles
+    Returns: canonical black bitboard, canonical white bitboard, index of the transform that maps the position onto it
+    """
+    blacks = [transform_bitboard(black, t) for t in range(len(TRANSFORMS))]
+    best_black = min(blacks)
+    best = None
+    for t, transformed in enumerate(blacks): #white only has to be transformed when black ties
+        if transformed == best_black:
+            candidate = (transformed, transform_bitboard(white, t), t)
+            if best is None or candidate < best: #a symmetric position gives the same bitboards for several transforms, the lowest index wins
+                best = candidate
+    return best
+
+def canonical_key(board, cur_id):
+    """
+    Finds a key shared by all symmetric versions of a position, for use in position stores
+    Params: instance of Board, id of player to move
+    Returns: 64 bit Zobrist key of the canonical position and player to move, index of the transform into the canonical frame
+    """
+    black, white, t = canonical(board.bitboards['B'], board.bitboards['W'])
+    if t == IDENTITY:
+        return board.hash ^ ZOBRIST_SIDE[cur_id], t
+    return hash_bitboards(black, white) ^ ZOBRIST_SIDE[cur_id], t
+
+def to_canonical(square, t):
+    """
+    Maps a move into the canonical frame
+    Params: flat index of the move on the real board, transform from canonical() or canonical_key()
+    Returns: flat index in the canonical frame
+    """
+    return SQUARE_MAPS[t][square]
+
+def from_canonical(square, t):
+    """
+    Maps a move from the canonical frame back onto the real board
+    Params: flat index in the canonical frame, transform from canonical() or canonical_key()
+    Returns: flat index of the move on the real board
+    """
+    return SQUARE_MAPS[INVERSE[t]][square]
@@ -0,0 +1,129 @@
+"""
+===================================================================================
+Name: tournament.py
+Author: Madi Sanchez-Forman
+Version: 5.10.23
+Decription: This script plays many games between two Computer_Player configurations
+without any prompts or board printing. Games are spread across a process pool and
+each result is written to a JSON lines file as soon as the game finishes.
+Example:
+    python tournament.py --games 1000 --workers 8 \
+        --player '{"name": "d3", "difficulty_level": 3}' \
+        --player '{"name": "d5", "difficulty_level": 5}' --output results.jsonl
+===================================================================================
+"""
+from board import Board, OTHER_ID, TILES_TO_COLOR, WINNER_NAMES
+from computer_player import Computer_Player
+from game_record import GameRecordWriter, COMPUTER
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
+import json
+import random
+import time
+
+#******************* Constants *******************#
+WINNER_RESULTS = {name: result for result, name in WINNER_NAMES.items()}
+
+#******************* Game Functions *******************#
+def make_player(max_id, config):
+    """
+    Builds a silent Computer_Player from a configuration
+    Params: id of the player, dictionary of Computer_Player keyword arguments (plus an optional 'name', which is ignored)
+    Returns: instance of Computer_Player
+    """
+    kwargs = {key: value for key, value in config.items() if key != 'name'}
+    return Computer_Player(max_id, verbose=False, **kwargs)
+
+def play_game(game_index, black_config, white_config, opening_plies, seed):
+    """
+    Plays one game between two bots. The first opening_plies moves are played at random so that games between the same bots differ
+    Params: number of the game, configuration of black and white bots, number of random opening moves, seed for the random moves
+    Returns: dictionary describing the game (moves are [x, y] or None for a pass, times are None for moves that were not searched)
+    """
+    board = Board('B', 'W')
+    players = {'B': make_player('B', black_config), 'W': make_player('W', white_config)}
+    rng = random.Random(seed)
+    moves, move_times = [], []
+    cur_id = 'B' #black goes first
+    while not board.is_terminal():
+        possible_moves = board.all_legal_moves(cur_id)
+        if not possible_moves: #player has to pass
+            moves.append(None)
+            move_times.append(None)
+        elif len(moves) < opening_plies:
+            x, y = rng.choice(possible_moves)
+            board.flip_tiles(board.find_tiles_taken(x, y, TILES_TO_COLOR[cur_id]), cur_id)
+            moves.append([x, y])
+            move_times.append(None)
+        else:
+            start = time.perf_counter()
+            x, y = players[cur_id].pick_move(board)
+            move_times.append(time.perf_counter() - start)
+            moves.append([x, y])
+        cur_id = OTHER_ID[cur_id]
+    for player in players.values():
+        player.close()
+    return {
+        'game': game_index,
+        'black': black_config.get('name', json.dumps(black_config)),
+        'white': white_config.get('name', json.dumps(white_config)),
+        'winner': WINNER_NAMES[board.find_winner()],
+        'score': board.get_score(),
+        'moves': moves,
+        'move_times': move_times,
+    }
+
+def run_tournament(configs, games, output_path, workers=None, opening_plies=4, seed=0, swap_colors=True, record_path=None):
+    """
+    Plays games between two bot configurations in a process pool, writing each result as a line of JSON when it finishes
+    Params: list of two configurations, number of games, path of the results file, number of processes (None for one per core),
+    number of random opening moves, base seed, whether the bots switch colors every game, optional binary game record file to append games to
+    Returns: dictionary of configuration name -> number of wins, plus 'tie'
+    """
+    assert len(configs) == 2
+    names = [config.get('name', json.dumps(config)) for config in configs]
+    wins = {names[0]: 0, names[1]: 0, 'tie': 0}
+    recorder = None if record_path is None else GameRecordWriter(record_path)
+    with ProcessPoolExecutor(max_workers=workers) as pool, open(output_path, 'w') as output:
+        futures = {}
+        for game_index in range(games):
+            black, white = configs
+            if swap_colors and game_index % 2 == 1:
+                black, white = white, black
+            futures[pool.submit(play_game, game_index, black, white, opening_plies, seed + game_index)] = (black, white)
+        for future in as_completed(futures):
+            result = future.result()
+            output.write(json.dumps(result) + '\n')
+            output.flush() #results can be read while the tournament is still running
+            if recorder is not None:
+                black, white = futures[future]
+                recorder.write_game((COMPUTER, black.get('difficulty_level', 0)), (COMPUTER, white.get('difficulty_level', 0)),
+                                    result['moves'], WINNER_RESULTS[result['winner']])
+            if result['winner'] == 'tie':
+                wins['tie'] += 1
+            else:
+                wins[result['black'] if result['winner'] == 'B' else result['white']] += 1
+    if recorder is not None:
+        recorder.close()
+    return wins
+
+#******************* Main Driver Function *******************#
+def main():
+    parser = argparse.ArgumentParser(description='Play a headless tournament between two bot configurations.')
+    parser.add_argument('--player', action='append', required=True, help='JSON object of Computer_Player arguments and a name, given twice')
+    parser.add_argument('--games', type=int, default=100, help='number of games to play')
+    parser.add_argument('--workers', type=int, default=None, help='number of processes (default: one per core)')
+    parser.add_argument('--opening-plies', type=int, default=4, help='number of random moves at the start of each game')
+    parser.add_argument('--seed', type=int, default=0, help='seed for the random opening moves')
+    parser.add_argument('--no-swap', action='store_true', help='keep the first player as black in every game')
+    parser.add_argument('--output', default='tournament_results.jsonl', help='file to write one JSON result per line to')
+    parser.add_argument('--record', default=None, help='binary game record file to append every game to (see game_record.py)')
+    args = parser.parse_args()
+    if len(args.player) != 2:
+        parser.error('--player must be given exactly twice')
+    configs = [json.loads(player) for player in args.player]
+    wins = run_tournament(configs, args.games, args.output, args.workers, args.opening_plies, args.seed, not args.no_swap, args.record)
+    print(json.dumps(wins))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+===================================================================================
+Name: train_patterns.py
+Author: Madi Sanchez-Forman
+Version: 5.10.23
+Decription: This script fits the weights of the pattern evaluation (pattern_eval.py)
+from recorded games. Every position of every game becomes a sample whose target is
+the final disc difference for the player to move, and each game stage is fitted on
+its own positions by damped least squares (conjugate gradients with NumPy).
+Games can come from tournament.py --record or main.py --record.
+Example:
+    python tournament.py --games 5000 --opening-plies 8 --record selfplay.rvg \
+        --player '{"name": "a", "difficulty_level": 3}' --player '{"name": "b", "difficulty_level": 3}'
+    python train_patterns.py selfplay.rvg --output patterns.bin
+===================================================================================
+"""
+from board import OTHER_ID
+from game_record import read_games, replay
+from pattern_eval import line_indexes, stage_of, canonical_indexes, write_weights, STAGES, WEIGHTS_PER_STAGE, LINES
+import argparse
+import numpy as np
+
+#******************* Helpers *******************#
+def game_samples(record):
+    """
+    Turns a recorded game into training samples
+    Params: GameRecord
+    Returns: list of (stage, line indexes, final disc difference for the player to move), one per position where a move was played
+    """
+    positions = []
+    board = None
+    for board, cur_id, move in replay(record): #the generator plays the last move before it stops, so board ends on the final position
+        if move is not None:
+            own, opp = board.bitboards[cur_id], board.bitboards[OTHER_ID[cur_id]]
+            positions.append((stage_of(own, opp), line_indexes(own, opp), cur_id))
+    if board is None:
+        return []
+    black_lead = board.counts['B'] - board.counts['W']
+    return [(stage, indexes, black_lead if cur_id == 'B' else -black_lead) for stage, indexes, cur_id in positions]
+
+def load_samples(paths):
+    """
+    Reads the samples of every game in some record files, split by stage
+    Params: list of record file paths
+    Returns: number of games, and per stage an array of canonical line indexes (samples x lines) and an array of targets
+    """
+    canonical = np.array(canonical_indexes(), dtype=np.int64) #mirrored contents of a line share one weight
+    by_stage = [([], []) for _ in range(STAGES)]
+    games = 0
+    for path in paths:
+        for record in read_games(path):
+            games += 1
+            for stage, indexes, target in game_samples(record):
+                by_stage[stage][0].append(indexes)
+                by_stage[stage][1].append(target)
+    samples = []
+    for indexes, targets in by_stage:
+        samples.append((canonical[np.array(indexes, dtype=np.int64).reshape(-1, len(LINES))], np.array(targets, dtype=np.float64)))
+    return games, samples
+
+def fit_stage(indexes, targets, iterations, damping):
+    """
+    Fits one stage's weights by minimizing squared error plus damping times the squared weights, with conjugate gradients (CGLS).
+    A weight that no sample uses stays 0
+    Params: array of line indexes (samples x lines), array of targets, number of iterations, damping
+    Returns: array of WEIGHTS_PER_STAGE weights
+    """
+    weights = np.zeros(WEIGHTS_PER_STAGE)
+    if len(targets) == 0:
+        return weights
+    flat = indexes.ravel()
+    lines = indexes.shape[1]
+    def transpose(errors): #gradient of the squared error with respect to every weight
+        return np.bincount(flat, weights=np.repeat(errors, lines), minlength=WEIGHTS_PER_STAGE)
+    residual = targets.copy()
+    gradient = transpose(residual)
+    direction = gradient.copy()
+    gamma = gradient @ gradient
+    for _ in range(iterations):
+        if gamma == 0:
+            break
+        change = direction[indexes].sum(axis=1)
+        step = gamma / (change @ change + damping * (direction @ direction))
+        weights += step * direction
+        residual -= step * change
+        gradient = transpose(residual) - damping * weights
+        new_gamma = gradient @ gradient
+        direction = gradient + (new_gamma / gamma) * direction
+        gamma = new_gamma
+    return weights
+
+def train(paths, output_path, iterations=100, damping=100.0):
+    """
+    Fits the pattern weights from recorded games and writes the weights file
+    Params: list of record file paths, path of the weights file, conjugate gradient iterations, damping
+    Returns: number of games, and list of (samples, root mean squared error in discs) per stage
+    """
+    games, samples = load_samples(paths)
+    stages, report = [], []
+    for indexes, targets in samples:
+        weights = fit_stage(indexes, targets, iterations, damping)
+        error = targets - weights[indexes].sum(axis=1) if len(targets) else np.zeros(1)
+        stages.append(weights)
+        report.append((len(targets), float(np.sqrt(np.mean(error ** 2)))))
+    write_weights(output_path, stages)
+    return games, report
+
+#******************* Main Driver Function *******************#
+def main():
+    parser = argparse.ArgumentParser(description='Fit the pattern evaluation weights from recorded games.')
+    parser.add_argument('records', nargs='+', help='game record files (see game_record.py)')
+    parser.add_argument('--output', default='patterns.bin', help='path of the weights file')
+    parser.add_argument('--iterations', type=int, default=100, help='conjugate gradient iterations per stage')
+    parser.add_argument('--damping', type=float, default=100.0, help='how strongly weights are pulled towards 0, higher for less data')
+    args = parser.parse_args()
+    games, report = train(args.records, args.output, args.iterations, args.damping)
+    print("Fitted " + str(games) + " games")
+    for stage, (count, error) in enumerate(report):
+        print("Stage " + str(stage) + ": " + str(count) + " positions, RMS error " + format(error, '.2f') + " discs")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+===================================================================================
+Name: transposition_table.py
+Author: Madi Sanchez-Forman
+Version: 5.10.23
+Decription: This script defines a fixed size transposition table that stores the
+results of minimax searches, keyed by the Zobrist hash of the board.
+===================================================================================
+"""
+
+#******************* Constants *******************#
+EXACT, LOWER, UPPER = 0, 1, 2 #bound types: score is exact, score is at least this much (beta cutoff), score is at most this much (failed low)
+KEY, DEPTH, FLAG, SCORE, MOVE, GENERATION = 0, 1, 2, 3, 4, 5 #index of each field in an entry
+ENTRY_BYTES = 160 #rough memory used by one entry (tuple plus the ints and float inside it), used to turn a memory cap into a number of slots
+DEFAULT_MEGABYTES = 64
+
+#******************* Transposition Table Class *******************#
+class TranspositionTable:
+    def __init__(self, max_megabytes=DEFAULT_MEGABYTES):
+        """
+        Initalizes the table with as many slots as fit in the memory cap. Each slot holds one entry, and a key always maps to the same slot
+        """
+        assert max_megabytes > 0
+        self.size = max(1, int(max_megabytes * 1024 * 1024) // ENTRY_BYTES) #number of slots
+        self.generation = 0 #incremented for each new search, so entries from old searches can be replaced first
+        self.clear()
+
+    def clear(self):
+        """
+        Removes every entry from the table
+        """
+        self.entries = [None] * self.size
+
+    def new_search(self):
+        """
+        Marks the start of a new search. Entries from earlier searches are kept, but any new entry may replace them
+        """
+        self.generation += 1
+
+    def probe(self, key):
+        """
+        Looks up a position in the table
+        Params: hash of the position
+        Returns: entry tuple (key, depth, flag, score, move, generation) or None if the position is not stored
+        """
+        entry = self.entries[key % self.size]
+        if entry is not None and entry[KEY] == key: #slot might hold a different position
+            return entry
+        return None
+
+    def store(self, key, depth, flag, score, move):
+        """
+        Stores the result of a search. When the slot is taken by another position, the deeper search is kept unless the old entry is from an earlier search
+        Params: hash of the position, depth searched, bound type, score, flat index of best move (or None)
+        """
+        index = key % self.size
+        entry = self.entries[index]
+        if entry is None or entry[KEY] == key or entry[GENERATION] != self.generation or depth >= entry[DEPTH]:
+            self.entries[index] = (key, depth, flag, score, move, self.generation)